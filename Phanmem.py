@@ -9,179 +9,97 @@ from PyQt5.QtGui import QTextDocument, QTextCursor
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import subprocess
-import openai
-import yaml
-from docx import Document
-import re
+import multiprocessing
 import shutil
-import dotenv
-
-
-dotenv.load_dotenv()  # Load environment variables from .env file
-
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-def AI_Func(df):
-    def load_conditions(file_path):
-        """Loads conditions from a .docx file.
-        Assumes YAML content is in a code block (within double backticks).
-        """
-        doc = Document(file_path)
-        yaml_content = ""
-
-        for paragraph in doc.paragraphs:
-            if paragraph.text.startswith("```") and paragraph.text.endswith("```"):
-                yaml_content = paragraph.text[3:-3]
-                break
-
-        if yaml_content:
-            conditions = yaml.safe_load(yaml_content)
-            return conditions
-        else:
-            raise ValueError("No YAML content found within code block in docx file.")
-
-
-    def save_conditions(file_path, conditions):
-        """Saves conditions to a .docx file.
-        Saves YAML content within a code block (in double backticks).
-        """
-        doc = Document()
-        doc.add_paragraph(f"```\n{yaml.dump(conditions)}\n```")
-        doc.save(file_path)
-
-
-    def check_sudden_drop(df, load_name, threshold=500):
-        """Check if a load has a sudden drop in the last month."""
-        thang_9_load = df[df["Tên"] == load_name]["Tháng 9"].values[0]
-        thang_8_load = df[df["Tên"] == load_name]["Tháng 8"].values[0]
-        return (thang_8_load - thang_9_load) > threshold
-
-
-    def get_llm_choice(potential_loads_df, highest_phase, lowest_phase, conditions_text):
-        """Asks the LLM to choose the best load to move."""
-
-       
-        loads_info = ""
-        for index, row in potential_loads_df.iterrows():
-            loads_info += f"  - {row['Tên']}: Tải Tháng 9 = {row['Tháng 9']}, Giảm đột ngột = {row['Giảm đột ngột']}\n"
-
-        prompt = (
-            f"Bạn là một chuyên gia trong việc cân bằng tải lưới điện.\n"
-            f"Giúp tôi chọn tải tốt nhất để di chuyển từ pha cao nhất ({highest_phase}) "
-            f"đến pha thấp nhất ({lowest_phase}) để tối ưu hóa sự cân bằng, xem xét các điều kiện sau:\n\n"
-            f"{conditions_text}\n\n"
-            f"Các tải tiềm năng (được sắp xếp theo thứ tự ưu tiên)::\n"
-            f"{loads_info}\n"
-            f"Chọn **tên** của tải tốt nhất để di chuyển, đảm bảo nó đáp ứng tất cả các điều kiện. "
-            f"Nếu không tìm thấy tải phù hợp, hãy phản hồi bằng 'Không có'."
-        )
-
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000
-        )
-
-        choice = response['choices'][0]['message']['content'].strip()
-    
-       
-        match = re.search(r"(Load_\d+)", choice)  
-        if match:
-            choice = match.group(1)
-        else:
-            choice = "None"  
-    
-        return choice
-
-
-    def balance_phases(df, conditions_text, max_iterations=15, max_moves_per_load=3):
-        """Balances phases using rules and LLM consultation."""
-
-        df["Pha di chuyển"] = "" 
-        df["Pha hiện tại"] = df["Pha"].copy()  
-        iteration = 0
-
-        while iteration < max_iterations:
-            phase_sums = df.groupby("Pha")["Tháng 9"].sum()
-            highest_phase = phase_sums.idxmax()
-            lowest_phase = phase_sums.idxmin()
-
-            print(f"\nLần lặp {iteration + 1}:")
-            print(f"Tổng pha hiện tại: {phase_sums.to_dict()}")
-
-            if (phase_sums.max() - phase_sums.min()) <= 200:
-                print("Các pha đã được cân bằng. Thoát.")
-                break
-
-            target_value = (phase_sums[highest_phase] - phase_sums[lowest_phase]) / 2
-
-            potential_loads = df[df["Pha"] == highest_phase].copy()
-            potential_loads["Khoảng cách"] = (potential_loads["Tháng 9"] - target_value).abs()
-            potential_loads = potential_loads[potential_loads["Pha di chuyển"].str.count(",") < max_moves_per_load] 
-
-          
-            potential_loads = potential_loads.sort_values(
-                by=["Khoảng cách", "Tháng 9", "Giảm đột ngột"], ascending=[True, True, False]
-            )
-
-            
-            llm_choice = get_llm_choice(potential_loads, highest_phase, lowest_phase, conditions_text)
-
-            print(f"LLM đã chọn di chuyển tải: {llm_choice}")
-
-            if llm_choice != "None" and llm_choice in df["Tên"].values:
-                df.loc[df["Tên"] == llm_choice, "Pha"] = lowest_phase
-                df.loc[df["Tên"] == llm_choice, "Pha di chuyển"] += (
-                    f"{highest_phase} sang {lowest_phase}" 
-                    if df.loc[df["Tên"] == llm_choice, "Pha di chuyển"].iloc[0] == "" 
-                    else f", {highest_phase} sang {lowest_phase}"
-                )
-            elif llm_choice == "None":
-                print("LLM không tìm thấy tải phù hợp để di chuyển trong lần lặp này.")
-            else:
-                print(f"LLM đề xuất tải không hợp lệ: {llm_choice}")
-
-            iteration += 1
-
-        if iteration == max_iterations:
-            print("Đạt đến số lần lặp tối đa. Thoát.")
-
-       
-        df['Pha đề xuất'] = df['Pha'].copy()  
-
-        df_balanced = df[['Tên', 'Khách hàng', 'Mã KH', 'Số công tơ', 'Sổ ghi số', 'Tháng 6', 'Tháng 7', 'Tháng 8', 'Tháng 9', 'Pha hiện tại', 'Pha di chuyển', 'Pha đề xuất']] 
-        return df_balanced
-
-
-    
-    df = pd.read_excel("table1.xlsx")
-    if 'Pha hiện tại' not in df.columns: 
-        df["Pha hiện tại"] = df["Pha"].copy()
-    df['Tháng 6'] = pd.to_numeric(df['Tháng 6'], errors='coerce')
-    df['Tháng 7'] = pd.to_numeric(df['Tháng 7'], errors='coerce')
-    df['Tháng 8'] = pd.to_numeric(df['Tháng 8'], errors='coerce')
-    df['Tháng 9'] = pd.to_numeric(df['Tháng 9'], errors='coerce')
-
-    df["Giảm đột ngột"] = df["Tên"].apply(lambda x: check_sudden_drop(df, x))
-
-    
-    conditions_text = """
-    Vấn đề: Các pha không cân bằng.
-    Mục tiêu: Cân bằng tải trên các pha để đảm bảo ổn định. 
-    Ưu tiên:
-    1. Gần nhất với giá trị mục tiêu.
-    2. Không nằm trong top 3 tải cao nhất.
-    3. Không giảm đột ngột trong Tháng 8.
+import queue
+import threading
+import time
+import instrumentation
+import llm_client
+import log_sink
+import sweep
+from balancing import SOLVERS, RunControl, phase_changes
+from engine import AI_Func, phase_report
+from profiles import open_profiles, profiles_path
+from station_data import (STATION_FILES, import_station, read_station, save_plan, station_key,
+                          station_view)
+from station_store import PlanConflict, get_store
+
+
+class DataFrameModel(QtCore.QAbstractTableModel):
+    """Read-only table model over a DataFrame.
+
+    The view asks only for visible cells, and each one is formatted from the
+    column's NumPy array when it is painted, so no per-cell item objects exist.
+    Balancing results are applied as a change set: the few changed cells are
+    kept as overrides and highlighted, and only their rows are repainted.
     """
 
-    df_balanced = balance_phases(df.copy(), conditions_text)
-
-    print("\n\nDữ liệu cân bằng cuối cùng:\n", df_balanced.to_string())
-    print("\nTổng pha cân bằng:\n", df_balanced.groupby("Pha đề xuất")["Tháng 9"].sum())  
-
-    return df_balanced
+    HIGHLIGHT = QtGui.QColor(255, 255, 0)
+
+    def __init__(self, df=None, parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self.set_dataframe(pd.DataFrame() if df is None else df)
+
+    def set_dataframe(self, df):
+        with instrumentation.timer("table.fill"):
+            self.beginResetModel()
+            self._df = df
+            self._columns = [df[column].to_numpy() for column in df.columns]
+            self._headers = [str(column) for column in df.columns]
+            self._overrides = {}
+            self._highlighted = set()
+            self.endResetModel()
+
+    def dataframe(self):
+        return self._df
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._df)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == QtCore.Qt.DisplayRole:
+            cell = (index.row(), index.column())
+            if cell in self._overrides:
+                return str(self._overrides[cell])
+            return str(self._columns[index.column()][index.row()])
+        if role == QtCore.Qt.BackgroundRole and index.row() in self._highlighted:
+            return self.HIGHLIGHT
+        return None
+
+    def highlight_rows(self, rows):
+        for row in rows:
+            self._highlighted.add(row)
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self._columns) - 1))
+
+    def apply_changes(self, changes, column="Pha"):
+        """Shows the new phase of each ``(row, old, new)`` change and highlights the row."""
+        if column not in self._headers:
+            return
+        j = self._headers.index(column)
+        for row, _, new in changes:
+            self._overrides[(row, j)] = new
+        self.highlight_rows([row for row, _, _ in changes])
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            return self._headers[section]
+        return str(section + 1)
+
+
+def make_table_view(parent, df=None):
+    """A QTableView bound to a DataFrameModel, with fixed-height rows."""
+    view = QtWidgets.QTableView(parent)
+    view.setModel(DataFrameModel(df, view))
+    view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+    return view
 
 
 class Ui_Form_PickTram(object):
@@ -251,8 +169,8 @@ class Ui_Form_PickTram(object):
         fileName, _ = QFileDialog.getOpenFileName(None, "QFileDialog.getOpenFileName()", "", file_filter, options=options)
         if fileName:
             if file_filter == "Excel Files (*.xlsx)":
-                df = pd.read_excel(fileName)
-                df.to_excel(f'{table_name}.xlsx', index=False)
+                with instrumentation.run("import_station", station=table_name):
+                    import_station(table_name, read_station(fileName), fileName)
 
                 msg = QMessageBox()
                 msg.setIcon(QMessageBox.Information)
@@ -277,7 +195,8 @@ class Ui_Form_PickTram(object):
         self.ConditionText.setText(_translate("Form", "Điều kiện xác định"))
         
 class Ui_Form_ResultFinal(object):
-    def setupUi_ResultFinal(self, Form, df_balanced): 
+    def setupUi_ResultFinal(self, Form, df_balanced, station=None): 
+        self.station = station
         Form.setObjectName("Form")
         Form.resize(1920, 1080)
         self.frame = QtWidgets.QFrame(Form)
@@ -316,7 +235,8 @@ class Ui_Form_ResultFinal(object):
         self.logo.setText("")
         self.logo.setPixmap(QtGui.QPixmap("OneDrive/Tài liệu/D14TDHHTD2/Đồ án tốt nghiệp/APP/.designer/.designer/lapso/Downloads/snapedit_1701002446534.png"))
         self.logo.setObjectName("logo")
-        self.RESULT_TABLE = QtWidgets.QTableWidget(self.frame)  
+        with instrumentation.run("ResultFinal", station=station):
+            self.RESULT_TABLE = make_table_view(self.frame, df_balanced)
         self.RESULT_TABLE.setGeometry(QtCore.QRect(320, 290, 971, 581))
         font = QtGui.QFont()
         font.setPointSize(14)
@@ -324,15 +244,7 @@ class Ui_Form_ResultFinal(object):
         self.RESULT_TABLE.setStyleSheet("background-color: rgb(255, 255, 255);\n"
 "color: rgb(0, 0, 0);")
         self.RESULT_TABLE.setObjectName("RESULT_TABLE")
-        self.RESULT_TABLE.setColumnCount(0)
-        self.RESULT_TABLE.setRowCount(0)
-        self.RESULT_TABLE.setRowCount(df_balanced.shape[0])
-        self.RESULT_TABLE.setColumnCount(df_balanced.shape[1])
-        self.RESULT_TABLE.setHorizontalHeaderLabels(df_balanced.columns.tolist())
-        
-        for i, row in df_balanced.iterrows():
-            for j, value in enumerate(row):
-                self.RESULT_TABLE.setItem(i, j, QtWidgets.QTableWidgetItem(str(value)))												 
+        self.RESULT_TABLE.model().highlight_rows([row for row, _, _ in phase_changes(df_balanced)])
         self.tentieude_2 = QtWidgets.QLabel(self.frame)
         self.tentieude_2.setGeometry(QtCore.QRect(1450, 220, 331, 51))
         font = QtGui.QFont()
@@ -348,8 +260,9 @@ class Ui_Form_ResultFinal(object):
         self.RESULT_TABLE.update()
         self.ResultFinalForm = Form
         self.df_balanced = df_balanced  
+        self.llm_workers = []
         self.PRINT.clicked.connect(self.save_as_excel)
-        self.PICK_AGAIN.clicked.connect(self.replace_df_with_table3)  
+        self.PICK_AGAIN.clicked.connect(self.revert_to_checkpoint)  
         self.textEdit = QtWidgets.QTextEdit(self.frame)
         self.textEdit.setGeometry(QtCore.QRect(1340, 290, 541, 581))
         font = QtGui.QFont()
@@ -359,8 +272,8 @@ class Ui_Form_ResultFinal(object):
         self.textEdit.setStyleSheet("background-color: rgb(255, 255, 255);\n"
 "color: rgb(0, 0, 0);")
         self.textEdit.setObjectName("textEdit")
-        sys.stdout.write = lambda message: self.textEdit.append(str(message))
-        sys.stderr.write = lambda message: self.textEdit.append(str(message))													   
+        log_sink.install()
+        self.log_view = LogView(self.textEdit)
         self.PRINTER = QtWidgets.QPushButton(self.frame)
         self.PRINTER.setGeometry(QtCore.QRect(1680, 890, 201, 41))
         self.dudoan = QtWidgets.QPushButton(self.frame)
@@ -377,6 +290,12 @@ class Ui_Form_ResultFinal(object):
         "color: rgb(255, 255, 255);")
         self.PRINTER.setObjectName("PRINTER")
         self.dudoan.setObjectName("dudoan")
+        self.STOP_AI = QtWidgets.QPushButton(self.frame)
+        self.STOP_AI.setGeometry(QtCore.QRect(1440, 950, 201, 41))
+        self.STOP_AI.setFont(font)
+        self.STOP_AI.setStyleSheet("background-color: rgb(0, 0, 255);\n"         
+        "color: rgb(255, 255, 255);")
+        self.STOP_AI.setObjectName("STOP_AI")
         self.tenappviettat = QtWidgets.QLabel(self.frame)
         self.tenappviettat.setGeometry(QtCore.QRect(0, 0, 1920, 130))
         font = QtGui.QFont()
@@ -420,22 +339,18 @@ class Ui_Form_ResultFinal(object):
         self.PRINTER.clicked.connect(self.print_file)
 
         
-    def replace_df_with_table3(self):  
-       df_new = pd.read_excel('table3.xlsx')
-       df_new.to_excel('table1.xlsx', index=False)
-       df_new.to_excel('table2.xlsx', index=False)
-
-       self.df_balanced = df_new  
-       self.RESULT_TABLE.setRowCount(self.df_balanced.shape[0])  
-       self.RESULT_TABLE.setColumnCount(self.df_balanced.shape[1])  
-       self.RESULT_TABLE.setHorizontalHeaderLabels(self.df_balanced.columns.tolist())  
-
-       for i, row in self.df_balanced.iterrows(): 
-           for j, value in enumerate(row):
-               self.RESULT_TABLE.setItem(i, j, QtWidgets.QTableWidgetItem(str(value)))
-
-       self.RESULT_TABLE.update()
+    def revert_to_checkpoint(self):  
+       store = get_store()
+       if self.station is None or not store.has(self.station):
+           return
+       with instrumentation.run("revert_to_checkpoint", station=self.station):
+           store.revert(self.station)
+           df_new = store.frame(self.station)
+
+           self.df_balanced = df_new
+           self.RESULT_TABLE.model().set_dataframe(self.df_balanced)
        QtWidgets.QApplication.processEvents()  
+       self.cancel_llm()
        self.ResultFinalForm.close()
 
 
@@ -471,24 +386,25 @@ class Ui_Form_ResultFinal(object):
         self.tenappviettat_2.setText(_translate("Form", "<html><head/><body><p>Tưởng Gia Huy-Trường đại học điện lực</p></body></html>"))
         self.tentieude.setText(_translate("Form", "Phương án cân bằng pha đề xuất"))
         self.dudoan.setText(_translate("Form", "Dự Đoán Từ AI"))
+        self.STOP_AI.setText(_translate("Form", "Dừng AI"))
         
         self.textEdit.textChanged.connect(self.append_llm_explanation) 
         self.dudoan.clicked.connect(self.predict_next_month)
+        self.STOP_AI.clicked.connect(self.cancel_llm)
         
 
     def append_llm_explanation(self):
-        """Appends the LLM's explanation if it's not already present."""
+        """Streams the LLM's explanation once the balancing summary is printed."""
         if "Model AI respond:" not in self.textEdit.toPlainText():  
             return 
 
        
         self.textEdit.textChanged.disconnect(self.append_llm_explanation) 
 
-        llm_explanation = self.get_llm_explanation()
-        self.textEdit.append(llm_explanation)
-        
-    def get_llm_explanation(self):
-        """Asks the LLM to explain what it did to balance the phases."""
+        self.start_llm_stream(self.explanation_prompt(), 1000)
+
+    def explanation_prompt(self):
+        """Builds the prompt asking the LLM to explain the proposed moves."""
 
       
         changed_loads = self.df_balanced[self.df_balanced['Pha hiện tại'] != self.df_balanced['Pha đề xuất']]
@@ -504,50 +420,187 @@ class Ui_Form_ResultFinal(object):
             f"{changed_loads_info}\n\n"
             f"Giải thích:"
         )
+        return prompt
 
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000
-        )
-
-        explanation = response['choices'][0]['message']['content'].strip()
-        return explanation
-    
     def predict_next_month(self):
-        """Sends a prompt to the LLM to predict next month's situation and appends the response."""
+        """Streams the LLM's prediction of next month's situation into the text box."""
     
         prompt = "Hãy thử dự đoán điều gì sẽ xảy ra trong tháng tới liên quan đến việc phân bố tải, và có thiên tai gì ảnh hưởng nặng nề không trong hệ thống 3 pha này không"
     
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500 
-        )
-    
-        prediction = response['choices'][0]['message']['content'].strip()
-        self.textEdit.append(f"Dự đoán từ AI là:\n{prediction}")
-        
+        self.dudoan.setEnabled(False)
+        worker = self.start_llm_stream(prompt, 500, "Dự đoán từ AI là:")
+        worker.finished.connect(lambda: self.dudoan.setEnabled(True))
+
+    def start_llm_stream(self, prompt, max_tokens, header=""):
+        """Runs one LLM request on a worker thread, inserting text as it arrives."""
+        self.textEdit.append(header)
+        if header:
+            self.textEdit.append("")
+        worker = LLMStreamThread(prompt, max_tokens)
+        worker.chunk.connect(self.insert_llm_text)
+        worker.failed.connect(lambda message: self.textEdit.append(f"Lỗi khi gọi AI: {message}"))
+        worker.finished.connect(lambda: self.llm_workers.remove(worker))
+        self.llm_workers.append(worker)
+        worker.start()
+        return worker
+
+    def insert_llm_text(self, text):
+        cursor = self.textEdit.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.textEdit.setTextCursor(cursor)
+        self.textEdit.ensureCursorVisible()
+
+    def cancel_llm(self):
+        """Stops every running explanation or prediction request."""
+        for worker in self.llm_workers:
+            worker.cancel()
+        if self.llm_workers:
+            self.textEdit.append("(Đã dừng AI)")
+
+
+class LogView(QtCore.QObject):
+    """Appends new log records to a text box every ``interval`` ms, in one batch.
+
+    The timer lives on the GUI thread; records reach the widget through a
+    queued signal, so worker threads only ever touch the ``LogSink``.
+    """
+    flushed = pyqtSignal(str)
+
+    def __init__(self, textEdit, sink=log_sink.SINK, interval=100, min_level=log_sink.INFO):
+        QtCore.QObject.__init__(self, textEdit)
+        self.textEdit = textEdit
+        self.sink = sink
+        self.min_level = min_level
+        self.seq = sink.last_seq()
+        self.flushed.connect(self.append, QtCore.Qt.QueuedConnection)
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start(interval)
+
+    def poll(self):
+        self.seq, records = self.sink.records_since(self.seq, self.min_level)
+        if records:
+            self.flushed.emit("\n".join(log_sink.format_record(record) for record in records))
+
+    def append(self, text):
+        self.textEdit.append(text)
+
+
+class LLMStreamThread(QThread):
+    """Streams one LLM reply; the network is read on a helper thread so ``cancel`` never waits on it."""
+    chunk = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, prompt, max_tokens=1000):
+        QThread.__init__(self)
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.pieces = queue.Queue()
+
+    def cancel(self):
+        self.requestInterruption()
+
+    def read(self, stream):
+        try:
+            for piece in stream:
+                if self.isInterruptionRequested():
+                    break
+                self.pieces.put(("piece", piece))
+        except Exception as e:
+            self.pieces.put(("error", str(e)))
+        finally:
+            stream.close()
+            self.pieces.put(("end", None))
+
+    def run(self):
+        stream = llm_client.chat_stream(self.prompt, self.max_tokens)
+        threading.Thread(target=self.read, args=(stream,), daemon=True).start()
+        while not self.isInterruptionRequested():
+            try:
+                kind, value = self.pieces.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if kind == "end":
+                return
+            if kind == "error":
+                self.failed.emit(value)
+                return
+            self.chunk.emit(value)
+
+
+class BalanceProgressDialog(QtWidgets.QDialog):
+    """Shows iteration, elapsed time and phase totals while a balancing thread runs.
+
+    "Dừng" asks the thread to stop; it then finishes with the best plan found
+    so far, so the result form still opens.
+    """
+
+    def __init__(self, thread, parent=None):
+        QtWidgets.QDialog.__init__(self, parent)
+        self.setWindowTitle("Cân bằng pha")
+        self.thread = thread
+        layout = QtWidgets.QVBoxLayout(self)
+        self.status = QtWidgets.QLabel("đang tính toán...")
+        layout.addWidget(self.status)
+        self.bars = {}
+        for phase in "ABC":
+            bar = QtWidgets.QProgressBar()
+            bar.setFormat(f"Pha {phase}: %v kWh")
+            bar.setRange(0, 1)
+            layout.addWidget(bar)
+            self.bars[phase] = bar
+        self.stop = QtWidgets.QPushButton("Dừng")
+        self.stop.clicked.connect(self.request_stop)
+        layout.addWidget(self.stop)
+        thread.progress.connect(self.update_progress)
+        thread.failed.connect(self.show_error)
+
+    def update_progress(self, iteration, sums, elapsed):
+        self.status.setText(f"Vòng lặp {iteration} - {elapsed:.1f}s")
+        top = max(1, int(max(sums.values())))
+        for phase, bar in self.bars.items():
+            bar.setRange(0, top)
+            bar.setValue(int(sums[phase]))
+
+    def show_error(self, message):
+        self.done(QtWidgets.QDialog.Rejected)
+        QMessageBox.warning(None, "Lỗi", f"Không cân bằng được pha: {message}")
+
+    def request_stop(self):
+        self.thread.cancel()
+        self.stop.setEnabled(False)
+        self.status.setText("Đang dừng, lấy phương án tốt nhất hiện có...")
+
+
 class LongOperationThread(QThread):
    finished = pyqtSignal(object)
+   progress = pyqtSignal(int, object, float)
+   failed = pyqtSignal(str)
 
    def __init__(self, selected_text):
        QThread.__init__(self)
        self.selected_text = selected_text
+       self.control = None
+
+   def cancel(self):
+       self.requestInterruption()
+       if self.control is not None:
+           self.control.cancel()
 
    def run(self):
-       df = None
+       self.control = RunControl(self.progress.emit)
+       if self.isInterruptionRequested():
+           self.control.cancel()
        print("đang được phát triển")
-       if self.selected_text == "Lê Ngọc Hân ":
-           df = pd.read_excel('table1.xlsx')
-           df = AI_Func(df)
-       elif self.selected_text == "Điều kiện xác định":
-           df = pd.read_excel('table2.xlsx')
-           df = AI_Func(df)
+       try:
+           df = station_view(self.selected_text)
+           if df is not None:
+               df = AI_Func(df, control=self.control)
+       except Exception as e:
+           print(f"Lỗi khi cân bằng: {e}")
+           self.failed.emit(str(e))
+           return
 
        self.finished.emit(df)
 
@@ -611,31 +664,25 @@ class Ui_Form_YesOrNo(object):
     def func_ResultFinal(self, df):
         self.Form = QtWidgets.QWidget()
         self.ui = Ui_Form_ResultFinal()
-        self.ui.setupUi_ResultFinal(self.Form, df)
+        self.ui.setupUi_ResultFinal(self.Form, df, station_key(self.selected_text))
         self.Form.show()
         self.msgBox.close()
         
     
     def generate_Phas(self, df):
-        self.msgBox = QMessageBox()
-        self.msgBox.setText("đang tính toán...")
-        self.msgBox.setStandardButtons(QMessageBox.NoButton)
-        self.msgBox.show()
-
-
         self.thread = LongOperationThread(self.selected_text)
         self.thread.finished.connect(self.on_finished)
+        self.msgBox = BalanceProgressDialog(self.thread)
+        self.msgBox.show()
         self.thread.start()
     
 
     def on_finished(self, df):
-        self.EXCEL_TABLE.setRowCount(len(df))
-        self.EXCEL_TABLE.setColumnCount(len(df.columns))
-        for i, row in enumerate(df.values):
-            for j, value in enumerate(row):
-                self.EXCEL_TABLE.setItem(i, j, QtWidgets.QTableWidgetItem(str(value)))
+        changes = phase_changes(df)
+        self.EXCEL_TABLE.model().apply_changes(changes)
+        save_plan(self.selected_text, changes, "llm")
         self.func_ResultFinal(df)
-        self.msgBox.done(QMessageBox.Accepted)
+        self.msgBox.done(QtWidgets.QDialog.Accepted)
         self.yesOrNoWindow.close()
         
 
@@ -830,6 +877,25 @@ class Ui_Form_ErrorRate(object):
         self.Cos_Phi.setFont(font)
         self.Cos_Phi.setStyleSheet("background-color: rgb(255, 255, 255);")
         self.Cos_Phi.setObjectName("Cos_Phi")
+        self.Solver_Box = QtWidgets.QComboBox(self.frame_2)
+        self.Solver_Box.setGeometry(QtCore.QRect(30, 490, 321, 41))
+        font = QtGui.QFont()
+        font.setFamily("Segoe UI")
+        font.setPointSize(16)
+        font.setBold(True)
+        font.setWeight(75)
+        self.Solver_Box.setFont(font)
+        self.Solver_Box.setStyleSheet("background-color: rgb(255, 255, 255);")
+        self.Solver_Box.setObjectName("Solver_Box")
+        self.Solver_Box.addItem("", "llm")
+        for solver in SOLVERS:
+            self.Solver_Box.addItem("", solver)
+        self.SWEEP = QtWidgets.QPushButton(self.frame_2)
+        self.SWEEP.setGeometry(QtCore.QRect(370, 490, 301, 41))
+        self.SWEEP.setFont(font)
+        self.SWEEP.setStyleSheet("background-color: rgb(255, 255, 255);\n"
+"color: rgb(0, 0, 139);")
+        self.SWEEP.setObjectName("SWEEP")
         self.chonkieunhapdulieu_12.raise_()
         self.chonkieunhapdulieu_9.raise_()
 										  
@@ -857,8 +923,11 @@ class Ui_Form_ErrorRate(object):
         self.MaxLoad_Box.textChanged.connect(self.update_max_load_change)
         self.Voltage.textChanged.connect(self.update_voltage)
         self.Cos_Phi.textChanged.connect(self.update_Cos_Phi)
+        self.Solver_Box.currentIndexChanged.connect(self.update_solver)
         self.nutdonglai_2.clicked.connect(self.generate_new_phase)
+        self.SWEEP.clicked.connect(self.open_sweep)
         self.ErrorRateWindow = Form
+        self.df = df
         
     def __init__(self, selected_text, EXCEL_TABLE):
         self.selected_text = selected_text
@@ -868,6 +937,7 @@ class Ui_Form_ErrorRate(object):
         self.max_load_change = 3
         self.voltageset = 220
         self.cosphi = 1
+        self.solver = "llm"
     
         self.ErrorRateWindow = None
 
@@ -883,25 +953,32 @@ class Ui_Form_ErrorRate(object):
     
     def update_Cos_Phi(self, text):
         self.cosphi = text
+
+    def update_solver(self, index):
+        self.solver = self.Solver_Box.itemData(index)
     
     def func_ResultFinal(self, df_balanced):
         self.msgBox.close()
         self.ErrorRateWindow.close()
         self.Form = QtWidgets.QWidget()
         self.ui = Ui_Form_ResultFinal()
-        self.ui.setupUi_ResultFinal(self.Form, df_balanced) 
+        self.ui.setupUi_ResultFinal(self.Form, df_balanced, station_key(self.selected_text)) 
         self.Form.show()
         
     def generate_new_phase(self, df):
-        self.msgBox = QMessageBox()
-        self.msgBox.setText("đang tính toán...")
-        self.msgBox.setStandardButtons(QMessageBox.NoButton)
-        self.msgBox.show()
-    
-        self.thread = LongOperationThread2(self.selected_text, self, df)
+        if self.solver == "peak" and open_profiles(profiles_path(STATION_FILES.get(self.selected_text, ""))) is None:
+            QMessageBox.warning(None, "Thiếu dữ liệu", "Trạm này chưa có dữ liệu phụ tải theo giờ (thư mục .profiles).")
+            return
+        self.thread = LongOperationThread2(self.selected_text, self, station_view(self.selected_text, self.df))
         self.thread.finished.connect(self.on_finished)
+        self.msgBox = BalanceProgressDialog(self.thread)
+        self.msgBox.show()
         self.thread.start()
 
+    def open_sweep(self):
+        self.sweep_window = SweepDialog(station_view(self.selected_text, self.df), self)
+        self.sweep_window.show()
+
     def show_pie_charts(self, current_old, current_new):
         self.chart_window = QtWidgets.QDialog()  
         self.chart_window.setWindowTitle("So sánh pha hiện tại")
@@ -943,14 +1020,14 @@ class Ui_Form_ErrorRate(object):
                         current_new_phase_A, current_new_phase_B, current_new_phase_C,
                         max_diff_new_phase_current, max_diff_old_phase_current,
                         PUI_old, PUI_new):
-        self.EXCEL_TABLE.setRowCount(len(df_balanced))
-        self.EXCEL_TABLE.setColumnCount(len(df_balanced.columns))
-        for i, row in enumerate(df_balanced.values):
-            for j, value in enumerate(row):
-                self.EXCEL_TABLE.setItem(i, j, QtWidgets.QTableWidgetItem(str(value)))
+        changes = phase_changes(df_balanced)
+        self.EXCEL_TABLE.model().apply_changes(changes)
+        save_plan(self.selected_text, changes, self.solver,
+                  {"PUI_old": PUI_old, "PUI_new": PUI_new, "max_diff_old": max_diff_old_phase_current,
+                   "max_diff_new": max_diff_new_phase_current})
 
         self.func_ResultFinal(df_balanced) 
-        self.msgBox.done(QMessageBox.Accepted)
+        self.msgBox.done(QtWidgets.QDialog.Accepted)
         diff_old_current = round(max_diff_old_phase_current,3)
         diff_new_current = round(max_diff_new_phase_current,3)
         current_old_A = round(current_old_phase_A,3)
@@ -997,68 +1074,219 @@ class Ui_Form_ErrorRate(object):
         self.chonkieunhapdulieu_10.setText(_translate("Form", "(V)"))
         self.chonkieunhapdulieu_11.setText(_translate("Form", "Hệ số công suất:"))
         self.chonkieunhapdulieu_12.setText(_translate("Form", "(Mặc định là 1 nếu không nhập)"))
+        self.Solver_Box.setItemText(0, _translate("Form", "Chọn tải bằng AI"))
+        self.Solver_Box.setItemText(1, _translate("Form", "Tham lam (không cần mạng)"))
+        self.Solver_Box.setItemText(2, _translate("Form", "Ít tải di chuyển nhất"))
+        self.Solver_Box.setItemText(3, _translate("Form", "Giảm dòng đỉnh (theo giờ)"))
+        self.SWEEP.setText(_translate("Form", "Thử nhiều thông số"))
+
+
+class SweepThread(QThread):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, df, scenarios, solver):
+        QThread.__init__(self)
+        self.df = df
+        self.scenarios = scenarios
+        self.solver = solver
+
+    def run(self):
+        try:
+            result = sweep.sweep(self.df, self.scenarios, self.solver, on_progress=self.progress.emit)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(result)
+
+
+class SweepDialog(QtWidgets.QDialog):
+    """Grids of voltage, cos φ, max current and max moves, and the table of results per scenario."""
+
+    def __init__(self, df, ui_form_error_rate):
+        QtWidgets.QDialog.__init__(self)
+        self.setWindowTitle("Thử nhiều thông số")
+        self.resize(1200, 700)
+        self.df = df
+        form = ui_form_error_rate
+        layout = QtWidgets.QVBoxLayout(self)
+        grid = QtWidgets.QFormLayout()
+        self.Voltage = QtWidgets.QLineEdit(str(form.voltageset))
+        self.Cos_Phi = QtWidgets.QLineEdit("0.85, 0.9, 0.95, 1")
+        self.Error = QtWidgets.QLineEdit("1, 2, 3, 5")
+        self.MaxLoad = QtWidgets.QLineEdit("1, 2, 3, 4, 5")
+        grid.addRow("Điện áp (V):", self.Voltage)
+        grid.addRow("Hệ số công suất:", self.Cos_Phi)
+        grid.addRow("Sai số dòng tối đa (A):", self.Error)
+        grid.addRow("Số tải tối đa được di chuyển:", self.MaxLoad)
+        layout.addLayout(grid)
+        self.solver = form.solver if form.solver in SOLVERS else "greedy"
+        layout.addWidget(QtWidgets.QLabel("Các giá trị cách nhau bởi dấu phẩy. Chạy bằng thuật toán cục bộ, không gọi AI."))
+        self.START = QtWidgets.QPushButton("Bắt đầu")
+        self.START.clicked.connect(self.start)
+        layout.addWidget(self.START)
+        self.bar = QtWidgets.QProgressBar()
+        layout.addWidget(self.bar)
+        self.TABLE = make_table_view(self)
+        layout.addWidget(self.TABLE)
+        self.thread = None
+
+    def start(self):
+        try:
+            scenarios = sweep.scenario_grid(sweep.parse_values(self.Voltage.text()),
+                                            sweep.parse_values(self.Cos_Phi.text()),
+                                            sweep.parse_values(self.Error.text()),
+                                            sweep.parse_values(self.MaxLoad.text(), int))
+        except ValueError:
+            QMessageBox.warning(self, "Lỗi", "Giá trị không hợp lệ")
+            return
+        if not scenarios:
+            return
+        self.START.setEnabled(False)
+        self.bar.setRange(0, len(scenarios))
+        self.bar.setValue(0)
+        self.thread = SweepThread(self.df, scenarios, self.solver)
+        self.thread.progress.connect(lambda done, total: self.bar.setValue(done))
+        self.thread.finished.connect(self.show_result)
+        self.thread.failed.connect(self.show_error)
+        self.thread.start()
+
+    def show_result(self, result):
+        self.TABLE.model().set_dataframe(result.rename(columns=sweep.COLUMNS))
+        self.TABLE.resizeColumnsToContents()
+        self.START.setEnabled(True)
+
+    def show_error(self, message):
+        QMessageBox.warning(self, "Lỗi", message)
+        self.START.setEnabled(True)
+
+
+class PlanHistoryDialog(QtWidgets.QDialog):
+    """Stored balancing plans of one station: apply, undo and compare them."""
+
+    COLUMNS = ["Mã", "Thời gian", "Thuật toán", "Số tải di chuyển", "PUI trước (%)", "PUI sau (%)", "Trạng thái"]
+
+    def __init__(self, key, on_change=None):
+        QtWidgets.QDialog.__init__(self)
+        self.setWindowTitle("Lịch sử phương án")
+        self.resize(1000, 600)
+        self.key = key
+        self.on_change = on_change
+        self.plans = []
+        layout = QtWidgets.QVBoxLayout(self)
+        self.TABLE = make_table_view(self)
+        self.TABLE.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        layout.addWidget(self.TABLE)
+        buttons = QtWidgets.QHBoxLayout()
+        for text, slot in (("Áp dụng", self.apply_selected), ("Hoàn tác", self.undo_last),
+                           ("So sánh 2 phương án", self.compare_selected)):
+            button = QtWidgets.QPushButton(text)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+        self.DIFF_TABLE = make_table_view(self)
+        layout.addWidget(self.DIFF_TABLE)
+        self.refresh()
+
+    def refresh(self):
+        self.plans = get_store().plans(self.key)
+        rows = [[plan["id"], time.strftime("%d/%m/%Y %H:%M", time.localtime(plan["created"])), plan["solver"],
+                 plan["moves"], plan["metrics"].get("PUI_old"), plan["metrics"].get("PUI_new"),
+                 "Dữ liệu cũ" if plan["stale"] else "Đang áp dụng" if plan["applied"] else ""]
+                for plan in self.plans]
+        self.TABLE.model().set_dataframe(pd.DataFrame(rows, columns=self.COLUMNS))
+        self.TABLE.resizeColumnsToContents()
+
+    def selected_plans(self):
+        return [self.plans[index.row()]["id"] for index in self.TABLE.selectionModel().selectedRows()]
+
+    def switch(self, action, plan_id):
+        try:
+            moves = action(plan_id)
+        except PlanConflict:
+            QMessageBox.warning(self, "Không thể thực hiện",
+                                "Pha hiện tại của trạm không còn khớp với phương án này.")
+            return
+        print(f"Phương án {plan_id}: đã chuyển {len(moves)} tải")
+        self.refresh()
+        if self.on_change is not None:
+            self.on_change()
+
+    def apply_selected(self):
+        selected = self.selected_plans()
+        if len(selected) != 1:
+            QMessageBox.information(self, "Lịch sử phương án", "Chọn một phương án để áp dụng.")
+            return
+        self.switch(get_store().apply_plan, selected[0])
+
+    def undo_last(self):
+        plan_id = get_store().last_applied(self.key)
+        if plan_id is None:
+            QMessageBox.information(self, "Lịch sử phương án", "Chưa có phương án nào được áp dụng.")
+            return
+        self.switch(get_store().undo_plan, plan_id)
+
+    def compare_selected(self):
+        selected = self.selected_plans()
+        if len(selected) != 2:
+            QMessageBox.information(self, "Lịch sử phương án", "Chọn hai phương án để so sánh.")
+            return
+        first, second = sorted(selected)
+        names = get_store().frame(self.key)["Tên"]
+        rows = [[row, names.iloc[row] if row < len(names) else "", phase_first, phase_second]
+                for row, phase_first, phase_second in get_store().compare_plans(first, second)]
+        self.DIFF_TABLE.model().set_dataframe(
+            pd.DataFrame(rows, columns=["Dòng", "Tên", f"Pha (phương án {first})", f"Pha (phương án {second})"]))
+        self.DIFF_TABLE.resizeColumnsToContents()
+
 
-   
 class LongOperationThread2(QThread):
     finished = pyqtSignal(object, object, object, object, object, object, object, object, object, object, object, object, object)  
+    progress = pyqtSignal(int, object, float)
+    failed = pyqtSignal(str)
 
     def __init__(self, selected_text, ui_form_error_rate, df):
         QThread.__init__(self)
         self.selected_text = selected_text
         self.ui_form_error_rate = ui_form_error_rate
         self.df = df
+        self.control = None
+
+    def cancel(self):
+        self.requestInterruption()
+        if self.control is not None:
+            self.control.cancel()
 
     def run(self):
+        self.control = RunControl(self.progress.emit)
+        if self.isInterruptionRequested():
+            self.control.cancel()
+        try:
+            self.balance()
+        except Exception as e:
+            print(f"Lỗi khi cân bằng: {e}")
+            self.failed.emit(str(e))
+
+    def balance(self):
         max_load_change = int(self.ui_form_error_rate.max_load_change)
         max_current = float(self.ui_form_error_rate.max_current)
         voltageset = int(self.ui_form_error_rate.voltageset)
         cosphi = float(self.ui_form_error_rate.cosphi)
-        time = 24 * 30  
-        voltagesetfinal = voltageset / 1000
-        
-        df_balanced = AI_Func(self.df)  
-
-        column_name = df_balanced.columns[-4]  
-
-       
-        old_distribution_total = df_balanced.groupby('Pha hiện tại')[column_name].sum()
-        new_distribution_total = df_balanced.groupby('Pha đề xuất')[column_name].sum() 
-
-        old_distribution_total = pd.to_numeric(old_distribution_total, errors='coerce')
-        new_distribution_total = pd.to_numeric(new_distribution_total, errors='coerce')
-      
-        for phase in ['A', 'B', 'C']:
-            if phase not in old_distribution_total:
-                old_distribution_total[phase] = 0
-            if phase not in new_distribution_total:
-                new_distribution_total[phase] = 0
-
-     
-        current_old_phase_A = old_distribution_total['A'] / (time * voltagesetfinal * cosphi) if (time * voltagesetfinal * cosphi) != 0 else 0
-        current_old_phase_B = old_distribution_total['B'] / (time * voltagesetfinal * cosphi) if (time * voltagesetfinal * cosphi) != 0 else 0
-        current_old_phase_C = old_distribution_total['C'] / (time * voltagesetfinal * cosphi) if (time * voltagesetfinal * cosphi) != 0 else 0
-
-        current_new_phase_A = new_distribution_total['A'] / (time * voltagesetfinal * cosphi) if (time * voltagesetfinal * cosphi) != 0 else 0
-        current_new_phase_B = new_distribution_total['B'] / (time * voltagesetfinal * cosphi) if (time * voltagesetfinal * cosphi) != 0 else 0
-        current_new_phase_C = new_distribution_total['C'] / (time * voltagesetfinal * cosphi) if (time * voltagesetfinal * cosphi) != 0 else 0
-
-        max_diff_new_phase_current = max(
-            abs(current_new_phase_A - current_new_phase_B),
-            abs(current_new_phase_A - current_new_phase_C),
-            abs(current_new_phase_B - current_new_phase_C)
-        )
-        max_diff_old_phase_current = max(
-            abs(current_old_phase_A - current_old_phase_B),
-            abs(current_old_phase_A - current_old_phase_C),
-            abs(current_old_phase_B - current_old_phase_C)
-        )
-        
-        average_old = round((current_old_phase_A + current_old_phase_B + current_old_phase_C) / 3, 3)
-        average_new = round((current_new_phase_A + current_new_phase_B + current_new_phase_C) / 3, 3)
-
-       
-        PUI_old = round((max_diff_old_phase_current / average_old) * 100, 3)
-        PUI_new = round((max_diff_new_phase_current / average_new) * 100, 3)
+        with instrumentation.run("LongOperationThread2", solver=self.ui_form_error_rate.solver):
+            df_balanced = AI_Func(self.df, self.ui_form_error_rate.solver, max_current=max_current,
+                                  max_load_change=max_load_change, voltage=voltageset, cosphi=cosphi,
+                                  control=self.control)
+
+            with instrumentation.timer("phase_report"):
+                report = phase_report(df_balanced, voltageset, cosphi)
+        current_old_phase_A, current_old_phase_B, current_old_phase_C = report["current_old"].values()
+        current_new_phase_A, current_new_phase_B, current_new_phase_C = report["current_new"].values()
+        max_diff_old_phase_current = report["max_diff_old"]
+        max_diff_new_phase_current = report["max_diff_new"]
+        PUI_old = report["PUI_old"]
+        PUI_new = report["PUI_new"]
+        print(f"Dòng trung tính đổi từ {round(report['neutral_old'], 3)}A sang {round(report['neutral_new'], 3)}A")
 
         changed_df = df_balanced[df_balanced['Pha hiện tại'] != df_balanced['Pha đề xuất']]  
         best_moved_machines_df = changed_df[['Tên', 'Pha hiện tại', 'Pha đề xuất']].copy()  
@@ -1158,8 +1386,14 @@ class Ui_Form_DataTram(object):
         self.CAN_DAO_PHA.setStyleSheet("background-color: rgb(255, 255, 255);\n"
 "color: rgb(0, 0, 139);")
         self.CAN_DAO_PHA.setObjectName("CAN_DAO_PHA")
+        self.HISTORY = QtWidgets.QPushButton(self.frame)
+        self.HISTORY.setGeometry(QtCore.QRect(1600, 260, 211, 51))
+        self.HISTORY.setFont(font)
+        self.HISTORY.setStyleSheet("background-color: rgb(255, 255, 255);\n"
+"color: rgb(0, 0, 139);")
+        self.HISTORY.setObjectName("HISTORY")
 									   
-        self.EXCEL_TABLE = QtWidgets.QTableWidget(self.frame)
+        self.EXCEL_TABLE = make_table_view(self.frame)
         self.EXCEL_TABLE.setGeometry(QtCore.QRect(400, 190, 1171, 661))
         font = QtGui.QFont()
         font.setPointSize(14)
@@ -1171,8 +1405,6 @@ class Ui_Form_DataTram(object):
 "color: rgb(0, 0, 0);\n"
 "border-color: rgb(0, 0, 0);")
         self.EXCEL_TABLE.setObjectName("EXCEL_TABLE")
-        self.EXCEL_TABLE.setColumnCount(0)
-        self.EXCEL_TABLE.setRowCount(0)
         self.tenappviettat_2 = QtWidgets.QLabel(self.frame)
         self.tenappviettat_2.setGeometry(QtCore.QRect(0, 110, 1920, 61))
         font = QtGui.QFont()
@@ -1192,6 +1424,7 @@ class Ui_Form_DataTram(object):
         self.NAME_OUTPUT.raise_()
         self.name.raise_()
         self.CAN_DAO_PHA.raise_()
+        self.HISTORY.raise_()
 						  
         self.EXCEL_TABLE.raise_()
         self.tenappviettat_2.raise_()
@@ -1204,15 +1437,15 @@ class Ui_Form_DataTram(object):
         self.BACK_BUTTON.clicked.connect(self.go_back)
         self.pick_tram_form = Ui_Form_PickTram()
         self.EDIT_BUTTON.clicked.connect(self.edit_button_clicked)
+        df = station_view(self.selected_text, df)
         if self.selected_text == "Lê Ngọc Hân ":
-            df = pd.read_excel('table1.xlsx')
             self.NAME_OUTPUT.setText("Lê Ngọc Hân")
         elif self.selected_text == "Điều kiện xác định":
-            df = pd.read_excel('table2.xlsx')
             self.NAME_OUTPUT.setText("Điều kiện xác định")
             
         self.df = df
-        self.CAN_DAO_PHA.clicked.connect(self.replace_table3_with_df)
+        self.CAN_DAO_PHA.clicked.connect(self.save_checkpoint)
+        self.HISTORY.clicked.connect(self.open_history)
         if 'Pha' in df.columns:
             self.CAN_DAO_PHA.clicked.connect(self.func_ErrorRate)
         else:
@@ -1229,25 +1462,13 @@ class Ui_Form_DataTram(object):
         self.MainWindow.show() 
         
     def load_data(self, df):
-        if self.selected_text == "Lê Ngọc Hân ":
-            df = pd.read_excel('table1.xlsx')
-        elif self.selected_text == "Điều kiện xác định":
-            df = pd.read_excel('table2.xlsx')
+        with instrumentation.run("DataTram.load_data", station=self.selected_text):
+            df = station_view(self.selected_text, df)
         
-        self.EXCEL_TABLE.setRowCount(0)
-        self.EXCEL_TABLE.setColumnCount(0)
-        self.EXCEL_TABLE.setRowCount(df.shape[0])
-        self.EXCEL_TABLE.setColumnCount(df.shape[1])
-        self.EXCEL_TABLE.setHorizontalHeaderLabels(df.columns.tolist())
-        for i, row in df.iterrows():
-            for j, value in enumerate(row):
-                self.EXCEL_TABLE.setItem(i, j, QtWidgets.QTableWidgetItem(str(value)))
+            self.EXCEL_TABLE.model().set_dataframe(df)
         
     def func_YesOrNo(self, df):
-        if self.selected_text == "Lê Ngọc Hân ":
-            df = pd.read_excel('table1.xlsx')
-        elif self.selected_text == "Điều kiện xác định":
-            df = pd.read_excel('table2.xlsx')
+        df = station_view(self.selected_text, df)
     
         self.Form = QtWidgets.QWidget()
         self.ui = Ui_Form_YesOrNo(self.selected_text, self.EXCEL_TABLE)  
@@ -1255,10 +1476,7 @@ class Ui_Form_DataTram(object):
         self.Form.show()
             
     def func_ErrorRate(self, df):
-        if self.selected_text == "Lê Ngọc Hân ":
-            df = pd.read_excel('table1.xlsx')
-        elif self.selected_text == "Điều kiện xác định":
-            df = pd.read_excel('table2.xlsx')
+        df = station_view(self.selected_text, df)
     
        
         self.Form = QtWidgets.QWidget()
@@ -1266,9 +1484,23 @@ class Ui_Form_DataTram(object):
         self.ui.setupUi_ErrorRate(self.Form, df)
         self.Form.show()
         
-    def replace_table3_with_df(self, df):
-        self.df.to_excel('table3.xlsx', index=False)
+    def save_checkpoint(self):
+        key = station_key(self.selected_text)
+        if key is not None and get_store().has(key):
+            get_store().checkpoint(key)
         
+    def open_history(self):
+        key = station_key(self.selected_text)
+        if key is None or not get_store().has(key):
+            return
+        self.history_window = PlanHistoryDialog(key, self.reload_station)
+        self.history_window.show()
+
+    def reload_station(self):
+        with instrumentation.run("DataTram.reload_station", station=self.selected_text):
+            self.df = station_view(self.selected_text, self.df)
+            self.EXCEL_TABLE.model().set_dataframe(self.df)
+
     def edit_button_clicked(self):
         if self.selected_text == "Lê Ngọc Hân ":
             self.pick_tram_form.load_data_doi_can()
@@ -1285,6 +1517,7 @@ class Ui_Form_DataTram(object):
         self.name.setText(_translate("Form", "Trạm:"))
         self.tenappviettat.setText(_translate("Form", "<html><head/><body><p>Phần mềm chuyển tải cân bằng pha</p></body></html>"))
         self.CAN_DAO_PHA.setText(_translate("Form", "Cân đảo pha"))
+        self.HISTORY.setText(_translate("Form", "Lịch sử"))
         self.tenappviettat_2.setText(_translate("Form", "<html><head/><body><p>Tưởng Gia Huy-Trường đại học điện lực</p></body></html>"))
 
 class Ui_Form_Name(object):
@@ -1524,8 +1757,9 @@ class Ui_MainWindow(object):
         self.selected_text = text
 
         if self.selected_text == "Lê Ngọc Hân ":
-            df = pd.read_excel('table1.xlsx')
-            self.func__DataTram(df) 
+            with instrumentation.run("open_station", station=self.selected_text):
+                df = station_view(self.selected_text)
+                self.func__DataTram(df)
 
         elif self.selected_text == "Điều kiện xác định":
             if os.path.exists("condition.docx"):
@@ -1564,6 +1798,11 @@ class Ui_MainWindow(object):
                                                       
                                                                                                                                                                                                                                                                                                                                                    #Credit: Tuong Gia Huy, Nguyen Trung Hieu, Tong Vinh Lap
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    if pd.__version__.startswith("2."):
+        pd.set_option("mode.copy_on_write", True)
+    if os.getenv("PHANMEM_LOG_FILE"):
+        log_sink.SINK.mirror_to(os.getenv("PHANMEM_LOG_FILE"))
     app = QtWidgets.QApplication(sys.argv)
     MainWindow = QtWidgets.QMainWindow()
     ui = Ui_MainWindow()
@@ -0,0 +1,52 @@
+"""Vectorized anomaly flags computed once for the whole station."""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+MONTH_PATTERN = re.compile(r"^Tháng (\d+)$")
+
+
+def _numbered_months(columns):
+    months = [(int(match.group(1)), column) for column in columns
+              if (match := MONTH_PATTERN.match(str(column)))]
+    return sorted(months)
+
+
+def month_columns(columns):
+    """Returns the ``Tháng N`` columns present, ordered by month number."""
+    return [column for _, column in _numbered_months(columns)]
+
+
+def consecutive_month_pairs(columns):
+    """Pairs of consecutive months present, e.g. (Tháng 6, Tháng 7), (Tháng 7, Tháng 8)."""
+    months = _numbered_months(columns)
+    return [(previous, current) for (a, previous), (b, current) in zip(months, months[1:]) if b - a == 1]
+
+
+def sudden_drop_flags(df, month_pairs=None, threshold=500, relative_threshold=None):
+    """Flags loads whose consumption dropped sharply between two months.
+
+    A row is flagged when, for any ``(previous, current)`` pair, the drop
+    exceeds ``threshold`` kWh or exceeds ``relative_threshold`` as a fraction
+    of the previous month. Either test can be disabled with ``None``. By
+    default every consecutive month pair present in ``df`` is checked.
+    """
+    if month_pairs is None:
+        month_pairs = consecutive_month_pairs(df.columns)
+    if not month_pairs:
+        return pd.Series(False, index=df.index, name="Giảm đột ngột")
+
+    previous = np.column_stack([pd.to_numeric(df[a], errors="coerce").to_numpy(dtype=float) for a, _ in month_pairs])
+    current = np.column_stack([pd.to_numeric(df[b], errors="coerce").to_numpy(dtype=float) for _, b in month_pairs])
+    drop = previous - current
+
+    flags = np.zeros(drop.shape, dtype=bool)
+    if threshold is not None:
+        flags |= drop > threshold
+    if relative_threshold is not None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            flags |= (previous > 0) & (drop / previous > relative_threshold)
+
+    return pd.Series(flags.any(axis=1), index=df.index, name="Giảm đột ngột")
@@ -0,0 +1,579 @@
+"""Phase-balancing solvers that run on NumPy arrays instead of asking the LLM.
+
+Every solver takes the station DataFrame prepared by ``AI_Func`` and returns
+the same ``df_balanced`` columns as the LLM loop in ``balance_phases``.
+"""
+import bisect
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from profiles import open_profiles, profiles_path
+
+
+PHASES = ("A", "B", "C")
+HOURS_PER_MONTH = 24 * 30
+
+BALANCED_COLUMNS = ['Tên', 'Khách hàng', 'Mã KH', 'Số công tơ', 'Sổ ghi số', 'Tháng 6', 'Tháng 7', 'Tháng 8',
+                    'Tháng 9', 'Pha hiện tại', 'Pha di chuyển', 'Pha đề xuất']
+
+
+def energy_tolerance(max_current, voltage=220, cosphi=1, hours=HOURS_PER_MONTH):
+    """Monthly kWh gap between two phases that equals ``max_current`` amperes."""
+    return float(max_current) * hours * float(voltage) / 1000 * float(cosphi)
+
+
+class RunControl:
+    """Progress callback and cooperative cancel flag for one balancing run.
+
+    Solvers call ``report`` once per iteration and stop at the next
+    iteration after ``cancel``, returning the plan built so far.
+    """
+
+    def __init__(self, on_progress=None):
+        self.on_progress = on_progress
+        self.started = time.perf_counter()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def report(self, iteration, sums):
+        if self.on_progress is not None:
+            totals = dict(zip(PHASES, (float(total) for total in sums)))
+            self.on_progress(iteration, totals, time.perf_counter() - self.started)
+
+
+def _stopped(control):
+    if control is not None and control.cancelled:
+        print("Đã dừng theo yêu cầu, dùng phương án tốt nhất hiện có.")
+        return True
+    return False
+
+
+def encode_phases(values):
+    """Maps phase labels to codes 0/1/2 (A/B/C); anything else becomes -1."""
+    labels = pd.Series(values).astype(str).str.strip().str.upper()
+    codes = labels.map({phase: code for code, phase in enumerate(PHASES)})
+    return codes.fillna(-1).to_numpy(dtype=np.int64)
+
+
+def load_array(df, column="Tháng 9"):
+    """Returns a column as a float array with missing readings counted as 0."""
+    return np.nan_to_num(pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float))
+
+
+def phase_sums(loads, codes):
+    """Total load per phase, always three entries (A, B, C)."""
+    valid = codes >= 0
+    return np.bincount(codes[valid], weights=loads[valid], minlength=len(PHASES))
+
+
+def _allowed(df):
+    """The ``Được di chuyển`` mask set by ``AI_Func`` from ``rules.py``, or ``None``."""
+    return df["Được di chuyển"].to_numpy(dtype=bool) if "Được di chuyển" in df.columns else None
+
+
+def _spread(sums):
+    return sums.max() - sums.min()
+
+
+class PhaseBook:
+    """Running phase totals plus, per phase, the movable loads sorted by size.
+
+    Entries are ``(load, no_sudden_drop, row)`` tuples kept sorted with
+    ``bisect``, so finding the loads closest to a target and applying a move
+    are both logarithmic searches instead of a regroup and re-sort of the
+    whole station. Loads that used up ``max_moves_per_load`` leave the book.
+    """
+
+    def __init__(self, loads, codes, drops=None, max_moves_per_load=3, move_counts=None):
+        self.loads = loads
+        self.codes = codes.copy()
+        self.counts = np.zeros(len(codes), dtype=np.int64) if move_counts is None else move_counts.copy()
+        self.max_moves_per_load = max_moves_per_load
+        drops = np.zeros(len(codes), dtype=bool) if drops is None else drops
+        self.keys = list(zip(loads.tolist(), (~drops).tolist(), range(len(codes))))
+        self.sums = phase_sums(loads, codes).tolist()
+        movable = self.counts < max_moves_per_load
+        self.entries = [sorted(self.keys[row] for row in np.flatnonzero((codes == phase) & movable))
+                        for phase in range(len(PHASES))]
+
+    def extremes(self):
+        """Codes of the highest and lowest phase."""
+        return self.sums.index(max(self.sums)), self.sums.index(min(self.sums))
+
+    def spread(self):
+        return max(self.sums) - min(self.sums)
+
+    def totals(self):
+        return dict(zip(PHASES, self.sums))
+
+    def is_movable(self, row):
+        return self.codes[row] >= 0 and self.counts[row] < self.max_moves_per_load
+
+    def candidates(self, phase, target, k=1):
+        """Rows of ``phase`` ordered by distance to ``target``, then load, then sudden drop first."""
+        entries = self.entries[phase]
+        position = bisect.bisect_left(entries, (target,))
+        start = max(0, position - k)
+        if start < position:
+            start = bisect.bisect_left(entries, (entries[start][0],))
+        window = entries[start:position + k]
+        window.sort(key=lambda entry: (abs(entry[0] - target), entry))
+        return [row for _, _, row in window[:k]]
+
+    def move(self, row, target):
+        """Moves ``row`` to phase ``target`` and returns the ``(row, from, to)`` move."""
+        source = int(self.codes[row])
+        key = self.keys[row]
+        entries = self.entries[source]
+        del entries[bisect.bisect_left(entries, key)]
+        self.codes[row] = target
+        self.counts[row] += 1
+        if self.counts[row] < self.max_moves_per_load:
+            bisect.insort(self.entries[target], key)
+        self.sums[source] -= key[0]
+        self.sums[target] += key[0]
+        return row, source, target
+
+
+def greedy_moves(loads, codes, drops=None, tolerance=200, max_iterations=15, max_moves_per_load=3,
+                 move_counts=None, control=None):
+    """Moves, one per iteration, the load closest to half the phase gap.
+
+    Ties are broken like the LLM candidate list: smaller load first, then
+    loads with a sudden drop. Returns the new codes, per-load move counts and
+    the list of ``(row, from_code, to_code)`` moves.
+    """
+    book = PhaseBook(loads, codes, drops, max_moves_per_load, move_counts)
+    moves = []
+
+    for iteration in range(max_iterations):
+        if control is not None:
+            control.report(iteration + 1, book.sums)
+        if _stopped(control):
+            break
+        highest, lowest = book.extremes()
+        spread = book.spread()
+        if spread <= tolerance:
+            break
+
+        candidates = book.candidates(highest, spread / 2)
+        if not candidates:
+            break
+        best = candidates[0]
+
+        sums = list(book.sums)
+        sums[highest] -= loads[best]
+        sums[lowest] += loads[best]
+        if max(sums) - min(sums) >= spread:
+            break
+
+        moves.append(book.move(best, lowest))
+
+    return book.codes, book.counts, moves
+
+
+def swap_improve(loads, codes, move_counts, tolerance=200, max_swaps=15, max_moves_per_load=3, control=None):
+    """Swaps one load of the highest phase with one of the lowest (2-opt).
+
+    For each load ``a`` on the highest phase the best partner ``b`` on the
+    lowest phase satisfies ``a - b ~ gap / 2`` and is found by binary search,
+    so one pass costs O(n log n).
+    """
+    codes = codes.copy()
+    counts = move_counts.copy()
+    moves = []
+
+    for iteration in range(max_swaps):
+        sums = phase_sums(loads, codes)
+        if control is not None:
+            control.report(iteration + 1, sums)
+        if _stopped(control):
+            break
+        highest, lowest = int(sums.argmax()), int(sums.argmin())
+        spread = sums[highest] - sums[lowest]
+        if spread <= tolerance:
+            break
+
+        movable = counts < max_moves_per_load
+        high_rows = np.flatnonzero((codes == highest) & movable)
+        low_rows = np.flatnonzero((codes == lowest) & movable)
+        if high_rows.size == 0 or low_rows.size == 0:
+            break
+
+        low_rows = low_rows[np.argsort(loads[low_rows], kind="stable")]
+        low_loads = loads[low_rows]
+        wanted = loads[high_rows] - spread / 2
+        right = np.clip(np.searchsorted(low_loads, wanted), 0, low_rows.size - 1)
+        left = np.clip(right - 1, 0, low_rows.size - 1)
+        partner = np.where(np.abs(low_loads[left] - wanted) <= np.abs(low_loads[right] - wanted), left, right)
+
+        delta = loads[high_rows] - low_loads[partner]
+        middle = sums[3 - highest - lowest]
+        new_high = sums[highest] - delta
+        new_low = sums[lowest] + delta
+        new_spread = (np.maximum(np.maximum(new_high, new_low), middle)
+                      - np.minimum(np.minimum(new_high, new_low), middle))
+        best = int(new_spread.argmin())
+        if new_spread[best] >= spread:
+            break
+
+        a, b = int(high_rows[best]), int(low_rows[partner[best]])
+        codes[a], codes[b] = lowest, highest
+        counts[a] += 1
+        counts[b] += 1
+        moves.append((a, highest, lowest))
+        moves.append((b, lowest, highest))
+
+    return codes, counts, moves
+
+
+def apply_moves(df, moves):
+    """Writes a move list back into ``Pha``/``Pha di chuyển``/``Pha đề xuất``."""
+    history = {}
+    final = {}
+    for row, source, target in moves:
+        history.setdefault(row, []).append(f"{PHASES[source]} sang {PHASES[target]}")
+        final[row] = target
+
+    pha = df["Pha"].to_numpy(dtype=object).copy()
+    moved = np.full(len(df), "", dtype=object)
+    for row, steps in history.items():
+        pha[row] = PHASES[final[row]]
+        moved[row] = ", ".join(steps)
+
+    df["Pha"] = pha
+    df["Pha di chuyển"] = moved
+    df["Pha đề xuất"] = df["Pha"].copy()
+    return df[BALANCED_COLUMNS]
+
+
+def phase_changes(df_balanced):
+    """Compact change set of a plan: ``(row, old_phase, new_phase)`` for moved loads only."""
+    old = df_balanced["Pha hiện tại"].to_numpy()
+    new = df_balanced["Pha đề xuất"].to_numpy()
+    rows = np.flatnonzero(old != new)
+    return [(int(row), old[row], new[row]) for row in rows]
+
+
+def greedy_balance(df, max_current=None, max_load_change=None, voltage=220, cosphi=1,
+                   max_iterations=15, max_moves_per_load=3, max_swaps=15, control=None):
+    """Balances phases with greedy moves and a swap pass, without the LLM.
+
+    Without ``max_current``/``max_load_change`` it keeps the 200 kWh
+    tolerance and iteration limit of ``balance_phases``.
+    """
+    df = df.reset_index(drop=True)
+    df["Pha hiện tại"] = df["Pha"].copy()
+
+    tolerance = 200 if max_current is None else energy_tolerance(max_current, voltage, cosphi)
+    if max_load_change is not None:
+        max_iterations = min(max_iterations, int(max_load_change))
+
+    loads = load_array(df)
+    codes = encode_phases(df["Pha"])
+    drops = df["Giảm đột ngột"].to_numpy(dtype=bool) if "Giảm đột ngột" in df.columns else None
+    allowed = _allowed(df)
+    pinned = None if allowed is None else np.where(allowed, 0, max_moves_per_load)
+
+    codes, counts, moves = greedy_moves(loads, codes, drops, tolerance, max_iterations, max_moves_per_load,
+                                        pinned, control)
+    if max_load_change is not None:
+        max_swaps = min(max_swaps, (int(max_load_change) - len(moves)) // 2)
+    codes, counts, swaps = swap_improve(loads, codes, counts, tolerance, max_swaps, max_moves_per_load, control)
+
+    print(f"Đã di chuyển {len(moves)} tải và hoán đổi {len(swaps) // 2} cặp tải.")
+    print(f"Tổng pha sau cân bằng: {dict(zip(PHASES, phase_sums(loads, codes).round(3).tolist()))}")
+    return apply_moves(df, moves + swaps)
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+def min_moves_plan(loads, codes, tolerance, max_moves=3, time_budget=10.0, control=None, allowed=None):
+    """Finds the fewest single-load moves that bring the phase spread under ``tolerance``.
+
+    Iterative deepening over the number of moves with branch-and-bound:
+    loads are visited in descending order and a plan only uses loads later in
+    that order, so every unvisited load is at most the current one. A node is
+    cut when the remaining moves of that size cannot remove the excess above
+    (or fill the deficit below) ``mean +- 2/3 * tolerance``, the band every
+    phase must end in. The last move is solved by binary search per direction.
+
+    Returns ``(moves, spread, optimal)``. When no plan fits in ``max_moves`` or
+    ``time_budget`` runs out (or ``control`` is cancelled), the best plan seen
+    so far is returned with ``optimal=False``. Only loads where ``allowed``
+    is true (all by default) are moved.
+    """
+    deadline = time.perf_counter() + time_budget
+    allowed = np.ones(len(codes), dtype=bool) if allowed is None else allowed
+    movable = np.flatnonzero((codes >= 0) & (loads > 0) & allowed)
+    order = movable[np.argsort(-loads[movable], kind="stable")]
+    L = loads[order].tolist()
+    C = codes[order].tolist()
+    n = len(order)
+    positions = [[i for i in range(n) if C[i] == p] for p in range(len(PHASES))]
+    negated = [[-L[i] for i in rows] for rows in positions]
+
+    start_sums = phase_sums(loads, codes).tolist()
+    mean = sum(start_sums) / 3
+    upper, lower = mean + 2 * tolerance / 3, mean - 2 * tolerance / 3
+    best = {"key": None, "path": [], "spread": None}
+    nodes = 0
+
+    def spread_of(sums):
+        return max(sums) - min(sums)
+
+    def record(sums, path):
+        spread = spread_of(sums)
+        key = (0, len(path), spread) if spread <= tolerance else (1, spread, len(path))
+        if best["key"] is None or key < best["key"]:
+            best.update(key=key, path=list(path), spread=spread)
+
+    def last_move(sums, start, path):
+        for p in range(3):
+            first = bisect.bisect_left(positions[p], start)
+            if first == len(positions[p]):
+                continue
+            for q in range(3):
+                if q == p:
+                    continue
+                o = 3 - p - q
+                low = max((sums[p] - sums[o]) - tolerance, (sums[o] - sums[q]) - tolerance,
+                          (sums[p] - sums[q] - tolerance) / 2)
+                high = min((sums[p] - sums[o]) + tolerance, (sums[o] - sums[q]) + tolerance,
+                           (sums[p] - sums[q] + tolerance) / 2)
+                if low > high:
+                    continue
+                j = max(bisect.bisect_left(negated[p], -high), first)
+                if j < len(negated[p]) and negated[p][j] <= -low:
+                    return path + [(positions[p][j], p, q)]
+        return None
+
+    def search(sums, start, remaining, path):
+        nonlocal nodes
+        nodes += 1
+        if nodes % 1024 == 0 and (time.perf_counter() > deadline
+                                  or (control is not None and control.cancelled)):
+            raise _SearchTimeout
+        record(sums, path)
+        if spread_of(sums) <= tolerance:
+            return path
+        if remaining == 1:
+            return last_move(sums, start, path)
+
+        excess = [max(0.0, s - upper) for s in sums]
+        deficit = [max(0.0, lower - s) for s in sums]
+        tried = set()
+        for i in range(start, n):
+            x = L[i]
+            if (sum(-(-e // x) for e in excess) > remaining
+                    or sum(-(-d // x) for d in deficit) > remaining):
+                break
+            p = C[i]
+            if (p, x) in tried:
+                continue
+            tried.add((p, x))
+            for q in range(3):
+                if q == p:
+                    continue
+                moved = list(sums)
+                moved[p] -= x
+                moved[q] += x
+                found = search(moved, i + 1, remaining - 1, path + [(i, p, q)])
+                if found is not None:
+                    return found
+        return None
+
+    plan, optimal = None, False
+    try:
+        record(start_sums, [])
+        if spread_of(start_sums) <= tolerance:
+            plan, optimal = [], True
+        for k in range(1, max_moves + 1):
+            if plan is not None or _stopped(control):
+                break
+            if control is not None:
+                control.report(k, start_sums)
+            plan = search(start_sums, 0, k, [])
+            optimal = plan is not None
+    except _SearchTimeout:
+        if not _stopped(control):
+            print("Hết thời gian tìm kiếm, dùng phương án tốt nhất đã tìm được.")
+
+    if plan is None:
+        plan = best["path"]
+    moves = [(int(order[i]), p, q) for i, p, q in plan]
+    spread = _plan_spread(loads, codes, moves)
+    if not optimal:
+        _, _, greedy = greedy_moves(loads, codes, tolerance=tolerance, max_iterations=max_moves, max_moves_per_load=1,
+                                    move_counts=(~allowed).astype(np.int64))
+        greedy_spread = _plan_spread(loads, codes, greedy)
+        if (spread > tolerance and greedy_spread < spread) or (
+                greedy_spread <= tolerance and len(greedy) < len(moves)):
+            moves, spread = greedy, greedy_spread
+    return moves, spread, optimal
+
+
+def _plan_sums(loads, codes, moves):
+    codes = codes.copy()
+    for row, _, target in moves:
+        codes[row] = target
+    return phase_sums(loads, codes)
+
+
+def _plan_spread(loads, codes, moves):
+    return _spread(_plan_sums(loads, codes, moves))
+
+
+def exact_balance(df, max_current=2, max_load_change=3, voltage=220, cosphi=1, time_budget=10.0,
+                  max_moves_per_load=3, control=None):
+    """Balances phases with the fewest moves that keep the current gap under ``max_current``.
+
+    A plan moves each load at most once, so ``max_moves_per_load`` only
+    matters when it is 0 and pins every load.
+    """
+    df = df.reset_index(drop=True)
+    df["Pha hiện tại"] = df["Pha"].copy()
+
+    tolerance = energy_tolerance(max_current, voltage, cosphi)
+    loads = load_array(df)
+    codes = encode_phases(df["Pha"])
+    allowed = _allowed(df) if max_moves_per_load > 0 else np.zeros(len(df), dtype=bool)
+    moves, spread, optimal = min_moves_plan(loads, codes, tolerance, int(max_load_change), time_budget, control,
+                                            allowed)
+    if control is not None:
+        control.report(len(moves), _plan_sums(loads, codes, moves))
+
+    if spread <= tolerance:
+        print(f"Cần di chuyển {len(moves)} tải{'' if optimal else ' (chưa chứng minh tối ưu)'}.")
+    else:
+        print(f"Không đạt sai số {max_current}A với tối đa {max_load_change} tải, "
+              f"độ lệch còn lại {round(spread, 3)} kWh.")
+    return apply_moves(df, moves)
+
+
+def _peak_intervals(profile, k):
+    """The ``k`` intervals with the highest single-phase load."""
+    top = profile.max(axis=0)
+    k = min(k, len(top))
+    return np.sort(np.argpartition(top, -k)[-k:])
+
+
+def peak_moves(columns, codes, movable, tolerance, max_moves, control=None):
+    """Greedy moves that lower the highest phase load over the intervals in ``columns``.
+
+    ``columns`` is loads x intervals (kWh). Each step moves the load, out of
+    the phase holding the peak, that gives the lowest new peak. It stops when
+    the phase gap at the peak is within ``tolerance``, when no move lowers the
+    peak or after ``max_moves``. A load is moved at most once.
+    """
+    codes = codes.copy()
+    movable = movable.copy()
+    sums = np.stack([columns[codes == code].sum(axis=0) for code in range(len(PHASES))])
+    moves = []
+    while len(moves) < max_moves:
+        source, interval = np.unravel_index(sums.argmax(), sums.shape)
+        if control is not None:
+            control.report(len(moves) + 1, sums[:, interval])
+        if _stopped(control):
+            break
+        peak = sums[source, interval]
+        if peak - sums[:, interval].min() <= tolerance:
+            break
+        candidates = np.flatnonzero((codes == source) & movable)
+        if not len(candidates):
+            break
+
+        loads = columns[candidates]
+        best = None
+        for target in range(len(PHASES)):
+            if target == source:
+                continue
+            other = sums[3 - source - target].max()
+            new_peak = np.maximum(np.maximum((sums[source] - loads).max(axis=1), (sums[target] + loads).max(axis=1)),
+                                  other)
+            position = new_peak.argmin()
+            if best is None or new_peak[position] < best[0]:
+                best = (new_peak[position], candidates[position], target)
+        if best[0] >= peak:
+            break
+
+        _, row, target = best
+        sums[source] -= columns[row]
+        sums[target] += columns[row]
+        codes[row] = target
+        movable[row] = False
+        moves.append((int(row), int(source), int(target)))
+    return codes, moves
+
+
+def peak_balance(df, max_current=None, max_load_change=3, voltage=220, cosphi=1, profiles=None,
+                 peak_intervals=48, max_rounds=3, max_moves_per_load=3, control=None):
+    """Balances the coincident-peak phase current of interval profiles instead of monthly totals.
+
+    Needs the station's ``.profiles`` folder (see ``profiles.py``) or a
+    ``LoadProfiles`` in ``profiles``. The search runs on the
+    ``peak_intervals`` busiest intervals; if the plan's peak falls outside
+    them, the new busiest intervals are added and the search goes on, up to
+    ``max_rounds`` times. Only the moved customers are re-read between rounds.
+    A load moves at most once; ``max_moves_per_load=0`` pins every load.
+    """
+    path = df.attrs.get("path")
+    store = profiles if profiles is not None else open_profiles(profiles_path(path)) if path else None
+    if store is None:
+        raise ValueError("Trạm này chưa có dữ liệu phụ tải theo giờ (thư mục .profiles).")
+
+    df = df.reset_index(drop=True)
+    df["Pha hiện tại"] = df["Pha"].copy()
+    codes = encode_phases(df["Pha"])
+    rows = store.rows_for(df["Tên"])
+    has_profile = rows >= 0
+    allowed = _allowed(df)
+    movable = has_profile if allowed is None else has_profile & allowed
+    if max_moves_per_load < 1:
+        movable = np.zeros(len(df), dtype=bool)
+    max_moves = 15 if max_load_change is None else int(max_load_change)
+    tolerance = 0 if max_current is None else energy_tolerance(max_current, voltage, cosphi,
+                                                                store.hours_per_interval)
+
+    profile = store.phase_profile(rows, codes)
+    peak_before = profile.max()
+    chosen = np.array([], dtype=np.int64)
+    moved = np.zeros(len(df), dtype=bool)
+    moves = []
+    for _ in range(max_rounds):
+        chosen = np.union1d(chosen, _peak_intervals(profile, peak_intervals))
+        columns = np.zeros((len(df), len(chosen)))
+        columns[has_profile] = store.columns(chosen)[rows[has_profile]]
+        codes, round_moves = peak_moves(columns, codes, movable & ~moved, tolerance, max_moves - len(moves),
+                                        control)
+        for row, source, target in round_moves:
+            reading = store.row(rows[row])
+            profile[source] -= reading
+            profile[target] += reading
+            moved[row] = True
+        moves += round_moves
+        if not round_moves or len(moves) >= max_moves or profile.max(axis=0).argmax() in chosen:
+            break
+
+    divisor = store.hours_per_interval * float(voltage) / 1000 * float(cosphi)
+    print(f"Dòng pha lớn nhất lúc cao điểm: {round(peak_before / divisor, 3)}A -> "
+          f"{round(profile.max() / divisor, 3)}A sau khi di chuyển {len(moves)} tải.")
+    return apply_moves(df, moves)
+
+
+SOLVERS = {
+    "greedy": greedy_balance,
+    "exact": exact_balance,
+    "peak": peak_balance,
+}
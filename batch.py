@@ -0,0 +1,166 @@
+"""Balance many station workbooks in parallel.
+
+    python batch.py tram/ --solver greedy --workers 8 --out ketqua/
+    python batch.py danhsach.csv --resume --out ketqua/
+
+The input is a folder (every ``.xlsx`` in it) or a manifest: a CSV with a
+``path`` column (and optionally ``name``), or a text file with one workbook
+path per line; repeated station names get a ``-2``, ``-3``... suffix so
+their plans do not overwrite each other. Stations run on a process pool.
+Each finished station is appended at once to ``results.jsonl`` and its plan
+written to ``plans/<station>.json``, so a crash only loses the stations still
+running; ``--resume`` skips stations already recorded as done. ``summary.csv`` holds
+the per-station PUI before and after.
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from balancing import SOLVERS
+from cli import plan_to_dict
+from engine import balance_station
+
+
+RESULTS_FILE = "results.jsonl"
+SUMMARY_FILE = "summary.csv"
+PLANS_DIR = "plans"
+
+
+def unique_names(stations):
+    """Suffixes repeated station names (``tram``, ``tram-2``, ...) so their plan files stay apart."""
+    seen = {}
+    taken = {name for name, _ in stations}
+    result = []
+    for name, path in stations:
+        if name in seen:
+            suffix = seen[name] + 1
+            while f"{name}-{suffix}" in taken:
+                suffix += 1
+            seen[name] = suffix
+            unique = f"{name}-{suffix}"
+            taken.add(unique)
+            print(f"Trùng tên trạm {name}: {path} được đặt tên {unique}", file=sys.stderr)
+        else:
+            seen[name] = 1
+            unique = name
+        result.append((unique, path))
+    return result
+
+
+def read_manifest(source):
+    """``[(name, path), ...]`` from a folder, a CSV manifest or a list of paths; names are unique."""
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "*.xlsx")))
+        return [(os.path.splitext(os.path.basename(path))[0], path) for path in paths
+                if not os.path.basename(path).startswith("~$")]
+    base = os.path.dirname(os.path.abspath(source))
+    if source.endswith(".csv"):
+        manifest = pd.read_csv(source)
+        names = manifest["name"] if "name" in manifest.columns else manifest["path"].map(
+            lambda path: os.path.splitext(os.path.basename(path))[0])
+        pairs = zip(names.astype(str), manifest["path"].astype(str))
+    else:
+        with open(source, encoding="utf-8") as file:
+            paths = [line.strip() for line in file if line.strip() and not line.startswith("#")]
+        pairs = [(os.path.splitext(os.path.basename(path))[0], path) for path in paths]
+    return unique_names([(name, path if os.path.isabs(path) else os.path.join(base, path)) for name, path in pairs])
+
+
+def balance_one(name, path, solver, options, plans_dir):
+    """Balances one station; returns its summary row (with ``error`` set if it failed)."""
+    started = time.perf_counter()
+    row = {"station": name, "path": path, "solver": solver}
+    try:
+        with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+            df_balanced, report = balance_station(path, solver, **options)
+        plan = plan_to_dict(path, solver, df_balanced, report)
+        with open(os.path.join(plans_dir, f"{name}.json"), "w", encoding="utf-8") as file:
+            json.dump(plan, file, ensure_ascii=False, indent=2)
+        row.update(rows=len(df_balanced), moves=plan["moves"], PUI_old=report["PUI_old"], PUI_new=report["PUI_new"],
+                   max_diff_old=round(report["max_diff_old"], 3), max_diff_new=round(report["max_diff_new"], 3),
+                   neutral_old=round(report["neutral_old"], 3), neutral_new=round(report["neutral_new"], 3),
+                   error=None)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - started, 3)
+    return row
+
+
+def finished_stations(results_path):
+    """Paths already balanced without error in an earlier run."""
+    done = set()
+    if os.path.exists(results_path):
+        with open(results_path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    row = json.loads(line)
+                    if not row.get("error"):
+                        done.add(row["path"])
+    return done
+
+
+def run_batch(stations, out_dir, solver="greedy", workers=None, resume=False, **options):
+    """Balances ``stations`` and returns the summary of every recorded station."""
+    plans_dir = os.path.join(out_dir, PLANS_DIR)
+    os.makedirs(plans_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, RESULTS_FILE)
+    requested = {path for _, path in stations}
+    if resume:
+        done = finished_stations(results_path)
+        stations = [(name, path) for name, path in stations if path not in done]
+    elif os.path.exists(results_path):
+        os.remove(results_path)
+
+    if stations:
+        with ProcessPoolExecutor(workers) as pool, open(results_path, "a", encoding="utf-8") as results:
+            futures = [pool.submit(balance_one, name, path, solver, options, plans_dir) for name, path in stations]
+            for count, future in enumerate(as_completed(futures), 1):
+                row = future.result()
+                results.write(json.dumps(row, ensure_ascii=False) + "\n")
+                results.flush()
+                status = row["error"] or f"PUI {row['PUI_old']}% -> {row['PUI_new']}%"
+                print(f"[{count}/{len(stations)}] {row['station']}: {status}", file=sys.stderr)
+
+    if not os.path.exists(results_path):
+        return pd.DataFrame()
+    with open(results_path, encoding="utf-8") as file:
+        summary = pd.DataFrame([json.loads(line) for line in file if line.strip()])
+    summary = summary[summary["path"].isin(requested)].drop_duplicates("path", keep="last").reset_index(drop=True)
+    summary.to_csv(os.path.join(out_dir, SUMMARY_FILE), index=False)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cân bằng pha cho nhiều trạm cùng lúc")
+    parser.add_argument("source", help="folder of station workbooks, or a manifest (.csv with 'path', or .txt)")
+    parser.add_argument("--out", default="batch_results", help="folder for results.jsonl, summary.csv and plans/")
+    parser.add_argument("--solver", default="greedy", choices=["llm", *SOLVERS])
+    parser.add_argument("--workers", type=int, help="processes (default: CPU count)")
+    parser.add_argument("--resume", action="store_true", help="skip stations already done in --out")
+    parser.add_argument("--voltage", type=float, default=220)
+    parser.add_argument("--cosphi", type=float, default=1)
+    parser.add_argument("--max-current", type=float, default=2)
+    parser.add_argument("--max-moves", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    summary = run_batch(read_manifest(args.source), args.out, args.solver, args.workers, args.resume,
+                        voltage=args.voltage, cosphi=args.cosphi, max_current=args.max_current,
+                        max_load_change=args.max_moves)
+    if summary.empty:
+        print("Không có trạm nào.", file=sys.stderr)
+        return 1
+    ok = summary[summary["error"].isna()]
+    print(f"{len(ok)}/{len(summary)} trạm thành công; PUI trung bình "
+          f"{ok['PUI_old'].mean():.3f}% -> {ok['PUI_new'].mean():.3f}%", file=sys.stderr)
+    return 0 if len(ok) == len(summary) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Benchmarks the balancing pipeline on synthetic stations of growing size.
+
+    python bench.py --sizes 100 1000 10000 100000 --out bench.json
+    python bench.py --sizes 1000000 --skip llm exact xlsx --compare bench.json
+
+Each size gets a generated station with the same columns as ``table1.xlsx``.
+Every stage is timed with ``time.perf_counter`` and its peak Python/numpy
+allocation taken from ``tracemalloc``. The LLM is replaced by a local backend
+that answers like ``llm_stub_server.py``, so no network or API key is needed.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import llm_client
+from anomalies import sudden_drop_flags
+from balancing import SOLVERS
+from engine import AI_Func, phase_report
+from llm_stub_server import canned_reply
+from profiles import create_profiles, profiles_path
+
+
+STATION_COLUMNS = ['Tên', 'Khách hàng', 'Mã KH', 'Số công tơ', 'Sổ ghi số',
+                   'Tháng 6', 'Tháng 7', 'Tháng 8', 'Tháng 9', 'Pha']
+STAGES = ["xlsx", "sudden_drop", "llm", "greedy", "exact", "peak", "report", "table"]
+
+
+def generate_station(rows, seed=0, skew=(0.5, 0.3, 0.2), drop_rate=0.02):
+    """Synthetic station with the ``table1.xlsx`` schema.
+
+    Monthly kWh is log-normal per customer with small month-to-month noise;
+    about ``drop_rate`` of the customers drop sharply in one month. Phases
+    are drawn with probabilities ``skew`` so there is something to balance.
+    """
+    rng = np.random.default_rng(seed)
+    base = rng.lognormal(mean=5.0, sigma=0.8, size=rows)
+    months = base[:, None] * rng.normal(1.0, 0.08, size=(rows, 4)).clip(0.5)
+    dropped = rng.random(rows) < drop_rate
+    drop_month = rng.integers(1, 4, size=rows)
+    for month in range(1, 4):
+        mask = dropped & (drop_month == month)
+        months[mask, month:] *= 0.1
+    months = months.round().astype(np.int64)
+
+    ids = np.arange(1, rows + 1)
+    return pd.DataFrame({
+        'Tên': [f"Load_{i}" for i in ids],
+        'Khách hàng': [f"Khách hàng {i}" for i in ids],
+        'Mã KH': [f"PD{i:09d}" for i in ids],
+        'Số công tơ': 20000000 + ids,
+        'Sổ ghi số': [f"S{i % 50:02d}" for i in ids],
+        'Tháng 6': months[:, 0],
+        'Tháng 7': months[:, 1],
+        'Tháng 8': months[:, 2],
+        'Tháng 9': months[:, 3],
+        'Pha': rng.choice(["A", "B", "C"], size=rows, p=skew),
+    }, columns=STATION_COLUMNS)
+
+
+def generate_profiles(df, folder, intervals=168, seed=0, chunk_rows=4096):
+    """Hourly readings with an evening peak for every load of ``df``, written block by block."""
+    rng = np.random.default_rng(seed)
+    readings = create_profiles(folder, df['Tên'], intervals)
+    hours = np.arange(intervals) % 24
+    monthly = df['Tháng 9'].to_numpy(dtype=float)
+    for start in range(0, len(df), chunk_rows):
+        block = slice(start, start + chunk_rows)
+        rows = len(monthly[block])
+        shift = rng.integers(-3, 4, size=(rows, 1))
+        shape = 1 + 0.8 * np.cos((hours - 19 - shift) * 2 * np.pi / 24) + 0.3 * rng.random((rows, intervals))
+        readings[block] = monthly[block, None] / 720 * 24 * shape / shape.mean(axis=1, keepdims=True)
+    readings.flush()
+
+
+class StubBackend:
+    """Answers like ``llm_stub_server.py`` without the HTTP round trip."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def complete(self, prompt, max_tokens=1000, model=llm_client.DEFAULT_MODEL):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return canned_reply(prompt)
+
+
+def measure(stage, rows, func, *args, **kwargs):
+    """Runs ``func`` once and returns ``(result, record)`` with time and peak memory."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        result = func(*args, **kwargs)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    record = {
+        "stage": stage,
+        "rows": rows,
+        "seconds": round(seconds, 6),
+        "rows_per_s": round(rows / seconds, 1) if seconds else None,
+        "peak_mb": round(peak / 2 ** 20, 3),
+    }
+    return result, record
+
+
+def _populate_table(df, visible_rows=50):
+    from PyQt5 import QtCore
+    from Phanmem import DataFrameModel
+
+    model = DataFrameModel(df)
+    for row in range(min(visible_rows, model.rowCount())):
+        for column in range(model.columnCount()):
+            model.data(model.index(row, column), QtCore.Qt.DisplayRole)
+    return model
+
+
+def _xlsx_round_trip(df, folder):
+    path = os.path.join(folder, "station.xlsx")
+    df.to_excel(path, index=False)
+    return pd.read_excel(path)
+
+
+def bench_size(rows, skip=(), seed=0, llm_latency=0.0, workdir=None, profile_hours=168):
+    """All stages for one station size, as a list of records."""
+    records = []
+    df, record = measure("generate", rows, generate_station, rows, seed)
+    records.append(record)
+    if "peak" not in skip:
+        df.attrs["path"] = os.path.join(workdir, f"station-{rows}.xlsx")
+        records.append(measure("profiles", rows, generate_profiles, df, profiles_path(df.attrs["path"]),
+                               profile_hours, seed)[1])
+
+    if "xlsx" not in skip:
+        records.append(measure("xlsx", rows, _xlsx_round_trip, df, workdir)[1])
+    if "sudden_drop" not in skip:
+        records.append(measure("sudden_drop", rows, sudden_drop_flags, df)[1])
+
+    balanced = None
+    if "llm" not in skip:
+        backend = StubBackend(llm_latency)
+        llm_client.set_backend(backend)
+        llm_client.set_cache(llm_client.ResponseCache(os.path.join(workdir, f"cache-{rows}.sqlite3")))
+        balanced, record = measure("llm", rows, AI_Func, df, "llm")
+        record["llm_calls"] = backend.calls
+        records.append(record)
+    for solver in SOLVERS:
+        if solver not in skip:
+            balanced, record = measure(solver, rows, AI_Func, df, solver)
+            records.append(record)
+
+    if balanced is not None and "report" not in skip:
+        records.append(measure("report", rows, phase_report, balanced)[1])
+    if balanced is not None and "table" not in skip:
+        try:
+            records.append(measure("table", rows, _populate_table, balanced)[1])
+        except ImportError:
+            pass
+    return records
+
+
+def compare(results, baseline_path):
+    """Prints the time ratio of every stage against a previous JSON run."""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {(r["stage"], r["rows"]): r for r in json.load(file)["results"]}
+    for record in results:
+        old = baseline.get((record["stage"], record["rows"]))
+        if old and old["seconds"]:
+            ratio = record["seconds"] / old["seconds"]
+            print(f"{record['stage']:>12} {record['rows']:>8}: {old['seconds']:.4f}s -> "
+                  f"{record['seconds']:.4f}s (x{ratio:.2f})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo hiệu năng quy trình cân bằng pha trên dữ liệu giả lập")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--skip", nargs="*", default=[], choices=STAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per stubbed LLM reply")
+    parser.add_argument("--profile-hours", type=int, default=168, help="hourly readings per load for 'peak'")
+    parser.add_argument("--out", default="bench.json")
+    parser.add_argument("--compare", help="previous JSON result to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.sizes:
+            for record in bench_size(rows, args.skip, args.seed, args.llm_latency, workdir, args.profile_hours):
+                print(f"{record['stage']:>12} {rows:>8} rows: {record['seconds']:.4f}s, "
+                      f"{record['peak_mb']:.1f} MB", file=sys.stderr)
+                results.append(record)
+
+    output = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as file:
+        json.dump(output, file, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Balance a station workbook from the command line, without the Qt window.
+
+    python cli.py table1.xlsx --solver exact --voltage 220 --cosphi 1 --max-current 2 --max-moves 3
+
+The plan (moved loads) and the phase currents / PUI are written as JSON to
+stdout or ``--json``, together with the stage timings and counters of the
+run; the balancing log goes to stderr.
+"""
+import argparse
+import contextlib
+import json
+import sys
+
+import instrumentation
+from balancing import SOLVERS
+from engine import balance_station
+
+
+def plan_to_dict(path, solver, df_balanced, report, full=False):
+    moved = df_balanced[df_balanced['Pha hiện tại'] != df_balanced['Pha đề xuất']]
+    rows = df_balanced if full else moved
+    return {
+        "station": path,
+        "solver": solver,
+        "moves": len(moved),
+        "plan": json.loads(rows.to_json(orient="records", force_ascii=False)),
+        "metrics": report,
+        "timing": instrumentation.last_run("balance_station"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cân bằng pha cho một trạm từ tệp Excel")
+    parser.add_argument("path", help="station workbook (.xlsx)")
+    parser.add_argument("--solver", default="greedy", choices=["llm", *SOLVERS])
+    parser.add_argument("--voltage", type=float, default=220)
+    parser.add_argument("--cosphi", type=float, default=1)
+    parser.add_argument("--max-current", type=float, default=2)
+    parser.add_argument("--max-moves", type=int, default=3)
+    parser.add_argument("--json", help="write the result here instead of stdout")
+    parser.add_argument("--full", action="store_true", help="include unchanged loads in the plan")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        df_balanced, report = balance_station(args.path, args.solver, args.voltage, args.cosphi,
+                                              args.max_current, args.max_moves)
+
+    result = plan_to_dict(args.path, args.solver, df_balanced, report, args.full)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Phase currents, PUI and neutral current for every month and many plans at once.
+
+Inputs are plain arrays: ``loads`` is customers x months (kWh) and ``plans``
+holds phase codes (0/1/2 for A/B/C, -1 for unknown, see
+``balancing.encode_phases``), either one assignment of shape ``(customers,)``
+or a stack of candidate assignments of shape ``(plans, customers)``. Every
+result has a leading plan axis, a phase axis where it applies, and a month
+axis last.
+"""
+import numpy as np
+
+from anomalies import month_columns
+from balancing import HOURS_PER_MONTH, PHASES, encode_phases, load_array
+
+# Unit phasors of phases A, B and C (0, -120 and +120 degrees).
+PHASORS = np.exp(-2j * np.pi * np.arange(len(PHASES)) / len(PHASES))
+
+
+def phase_energy(loads, plans):
+    """kWh per plan, phase and month: shape ``(plans, 3, months)``."""
+    loads = np.nan_to_num(np.asarray(loads, dtype=float))
+    if loads.ndim == 1:
+        loads = loads[:, None]
+    plans = np.atleast_2d(np.asarray(plans))
+    return np.stack([(plans == code).astype(float) @ loads for code in range(len(PHASES))], axis=1)
+
+
+def phase_currents(energy, voltage=220, cosphi=1, hours=HOURS_PER_MONTH):
+    """Average current (A) from monthly energy; ``hours`` may be one value per month."""
+    divisor = np.asarray(hours, dtype=float) * (float(voltage) / 1000) * float(cosphi)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        currents = energy / divisor
+    return np.where(divisor != 0, currents, 0.0)
+
+
+def max_deviation(currents):
+    """Largest difference between any two phase currents (over the phase axis)."""
+    return currents.max(axis=-2) - currents.min(axis=-2)
+
+
+def pui(currents):
+    """Phase unbalance index in %: largest deviation over the mean phase current."""
+    mean = currents.mean(axis=-2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        index = max_deviation(currents) / mean * 100
+    return np.where(mean != 0, index, 0.0)
+
+
+def neutral_current(currents):
+    """Magnitude of the phasor sum of the three phase currents, assuming equal power factors."""
+    return np.abs(np.tensordot(PHASORS, currents, axes=([0], [-2])))
+
+
+def electrical_metrics(loads, plans, voltage=220, cosphi=1, hours=HOURS_PER_MONTH):
+    """Everything above in one pass, as a dict of arrays."""
+    energy = phase_energy(loads, plans)
+    currents = phase_currents(energy, voltage, cosphi, hours)
+    return {
+        "energy": energy,
+        "currents": currents,
+        "max_deviation": max_deviation(currents),
+        "pui": pui(currents),
+        "neutral": neutral_current(currents),
+    }
+
+
+def station_metrics(df, plan_columns=("Pha hiện tại", "Pha đề xuất"), columns=None, voltage=220, cosphi=1,
+                    hours=HOURS_PER_MONTH):
+    """``electrical_metrics`` for the plans stored as phase columns of a station table.
+
+    ``columns`` defaults to every ``Tháng N`` column, in month order; the
+    returned dict also holds the month and plan names used.
+    """
+    columns = month_columns(df.columns) if columns is None else list(columns)
+    loads = np.column_stack([load_array(df, column) for column in columns])
+    plans = np.stack([encode_phases(df[column]) for column in plan_columns])
+    metrics = electrical_metrics(loads, plans, voltage, cosphi, hours)
+    metrics["months"] = columns
+    metrics["plans"] = list(plan_columns)
+    return metrics
@@ -0,0 +1,197 @@
+"""Phase-balancing pipeline shared by the Qt app and the command line.
+
+Nothing here imports PyQt5 or matplotlib, so stations can be balanced on a
+server with ``cli.py``.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+import llm_client
+import prompts
+from balancing import (HOURS_PER_MONTH, PHASES, SOLVERS, PhaseBook, _stopped, apply_moves, encode_phases,
+                       energy_tolerance, load_array)
+from electrical import station_metrics
+from rules import MOVABLE_COLUMN, load_rules
+from station_data import REGISTRY
+
+
+def AI_Func(df=None, solver="llm", path="table1.xlsx", control=None, **solver_options):
+    def get_llm_choice(potential_loads_df, highest_phase, lowest_phase, target_value, conditions_text):
+        """Asks the LLM to choose the best load to move."""
+        prompt, tokens, used = prompts.choice_prompt(potential_loads_df, highest_phase, lowest_phase,
+                                                     target_value, conditions_text)
+        instrumentation.count("prompt.tokens", tokens)
+        instrumentation.count("prompt.candidates", used)
+        print(f"Prompt: {tokens} token, {used}/{len(potential_loads_df)} tải ứng viên")
+
+        reply = llm_client.chat(prompt, max_tokens=prompts.CHOICE_MAX_TOKENS, store=False)
+
+        match = re.search(r"(Load_\d+)", reply)
+        if match:
+            choice = match.group(1)
+        else:
+            choice = "None"
+
+        return choice, prompt, reply
+
+    def balance_phases(df, conditions_text, rules, tolerance=None, max_moves=None, max_iterations=15,
+                       max_candidates=50, max_idle=2):
+        """Balances phases using rules and LLM consultation.
+
+        Stops once the spread is within ``tolerance`` (kWh, default from the
+        rules), ``max_moves`` loads have moved, or ``max_idle`` iterations in
+        a row moved nothing. Only accepted replies are cached.
+        """
+        tolerance = rules.tolerance if tolerance is None else tolerance
+
+        df = df.reset_index(drop=True)
+        df["Pha hiện tại"] = df["Pha"].copy()
+        pinned = np.where(df[MOVABLE_COLUMN].to_numpy(dtype=bool), 0, rules.max_moves_per_load)
+        with instrumentation.timer("phasebook.build"):
+            book = PhaseBook(load_array(df), encode_phases(df["Pha"]), df["Giảm đột ngột"].to_numpy(dtype=bool),
+                             rules.max_moves_per_load, pinned)
+        moves = []
+        iteration = 0
+        idle = 0
+
+        while iteration < max_iterations:
+            if control is not None:
+                control.report(iteration + 1, book.sums)
+            if _stopped(control):
+                break
+            highest, lowest = book.extremes()
+            highest_phase, lowest_phase = PHASES[highest], PHASES[lowest]
+
+            print(f"\nLần lặp {iteration + 1}:")
+            print(f"Tổng pha hiện tại: {book.totals()}")
+
+            if book.spread() <= tolerance:
+                print("Các pha đã được cân bằng. Thoát.")
+                break
+
+            if max_moves is not None and len(moves) >= max_moves:
+                print(f"Đã di chuyển đủ {max_moves} tải. Thoát.")
+                break
+
+            target_value = book.spread() / 2
+
+            with instrumentation.timer("candidates"):
+                potential_loads = df.iloc[book.candidates(highest, target_value, max_candidates)]
+
+            try:
+                with instrumentation.timer("llm.choice"):
+                    llm_choice, prompt, reply = get_llm_choice(potential_loads, highest_phase, lowest_phase,
+                                                               target_value, conditions_text)
+            except llm_client.LLMError as e:
+                print(f"Không gọi được LLM ({e}), dùng phương án hiện có.")
+                instrumentation.count("llm.failed")
+                break
+
+            print(f"LLM đã chọn di chuyển tải: {llm_choice}")
+
+            # Only a load from the prompt, still on the highest phase, may move.
+            offered = {}
+            for row, name in zip(potential_loads.index, potential_loads["Tên"]):
+                offered.setdefault(name, row)
+            row = offered.get(llm_choice)
+
+            if llm_choice != "None" and row is not None and book.codes[row] == highest and book.is_movable(row):
+                moves.append(book.move(row, lowest))
+                llm_client.remember(prompt, reply, max_tokens=prompts.CHOICE_MAX_TOKENS)
+                instrumentation.count("llm.accepted")
+                idle = 0
+            else:
+                if llm_choice == "None":
+                    print("LLM không tìm thấy tải phù hợp để di chuyển trong lần lặp này.")
+                    instrumentation.count("llm.none")
+                else:
+                    print(f"LLM đề xuất tải không hợp lệ: {llm_choice}")
+                    instrumentation.count("llm.rejected")
+                idle += 1
+                if idle >= max_idle:
+                    print(f"{idle} lần lặp liên tiếp không di chuyển được tải. Thoát.")
+                    break
+
+            iteration += 1
+
+        if iteration == max_iterations:
+            print("Đạt đến số lần lặp tối đa. Thoát.")
+
+        df_balanced = apply_moves(df, moves)
+        return df_balanced
+
+    with instrumentation.run("AI_Func", solver=solver):
+        with instrumentation.timer("load"):
+            df = REGISTRY.view(path) if df is None else df.copy()
+            if 'Pha hiện tại' not in df.columns:
+                df["Pha hiện tại"] = df["Pha"].copy()
+            df['Tháng 6'] = pd.to_numeric(df['Tháng 6'], errors='coerce')
+            df['Tháng 7'] = pd.to_numeric(df['Tháng 7'], errors='coerce')
+            df['Tháng 8'] = pd.to_numeric(df['Tháng 8'], errors='coerce')
+            df['Tháng 9'] = pd.to_numeric(df['Tháng 9'], errors='coerce')
+        instrumentation.count("rows", len(df))
+
+        with instrumentation.timer("rules"):
+            rules = load_rules()
+            df["Giảm đột ngột"] = rules.sudden_drops(df)
+            df[MOVABLE_COLUMN] = rules.movable(df, df["Giảm đột ngột"])
+        instrumentation.count("pinned", int((~df[MOVABLE_COLUMN]).sum()))
+
+        conditions_text = f"""
+    Vấn đề: Các pha không cân bằng.
+    Mục tiêu: Cân bằng tải trên các pha để đảm bảo ổn định. 
+    Ưu tiên: gần nhất với giá trị mục tiêu.
+    {rules.describe()}
+    """
+
+        with instrumentation.timer(f"solve.{solver}"):
+            if solver == "llm":
+                max_current = solver_options.get("max_current")
+                tolerance = None if max_current is None else energy_tolerance(
+                    max_current, solver_options.get("voltage", 220), solver_options.get("cosphi", 1))
+                max_moves = solver_options.get("max_load_change")
+                df_balanced = balance_phases(df.copy(), conditions_text, rules, tolerance,
+                                             None if max_moves is None else int(max_moves))
+            elif solver in SOLVERS:
+                df_balanced = SOLVERS[solver](df.copy(), max_moves_per_load=rules.max_moves_per_load,
+                                              control=control, **solver_options)
+            else:
+                raise ValueError(f"Unknown solver mode: {solver}")
+
+        with instrumentation.timer("print"):
+            print("\n\nDữ liệu cân bằng cuối cùng:\n", df_balanced.to_string())
+            print("\nTổng pha cân bằng:\n", df_balanced.groupby("Pha đề xuất")["Tháng 9"].sum())
+        if solver == "llm":
+            stats = llm_client.get_cache().stats()
+            print(f"Bộ nhớ đệm LLM: {stats['hits']} lần trúng, {stats['misses']} lần gọi API")
+            histogram = getattr(llm_client.get_backend(), "histogram", None)
+            if histogram is not None:
+                latency = histogram.snapshot()
+                print(f"Độ trễ LLM: p50 <= {latency['p50_s']}s, p95 <= {latency['p95_s']}s qua {latency['calls']} lần gọi")
+
+    return df_balanced
+
+
+def phase_report(df_balanced, voltage=220, cosphi=1, column="Tháng 9", hours=HOURS_PER_MONTH):
+    """Phase currents, largest current gap, PUI and neutral current before and after balancing."""
+    metrics = station_metrics(df_balanced, columns=[column], voltage=voltage, cosphi=cosphi, hours=hours)
+    report = {}
+    for plan, label in enumerate(("old", "new")):
+        report[f"current_{label}"] = dict(zip(PHASES, metrics["currents"][plan, :, 0].tolist()))
+        report[f"max_diff_{label}"] = float(metrics["max_deviation"][plan, 0])
+        report[f"PUI_{label}"] = round(float(metrics["pui"][plan, 0]), 3)
+        report[f"neutral_{label}"] = float(metrics["neutral"][plan, 0])
+    return report
+
+
+def balance_station(path, solver="greedy", voltage=220, cosphi=1, max_current=2, max_load_change=3):
+    """Balances one station workbook and returns ``(df_balanced, report)``."""
+    options = {"max_current": max_current, "max_load_change": max_load_change, "voltage": voltage, "cosphi": cosphi}
+    with instrumentation.run("balance_station", solver=solver):
+        df_balanced = AI_Func(None, solver, path=path, **options)
+        with instrumentation.timer("phase_report"):
+            report = phase_report(df_balanced, voltage, cosphi)
+    return df_balanced, report
@@ -0,0 +1,115 @@
+"""Stage timers and counters for one balancing run.
+
+    with instrumentation.run("AI_Func", solver="greedy"):
+        with instrumentation.timer("excel.parse"):
+            ...
+        instrumentation.count("llm.rejected")
+
+``timer`` and ``count`` record into the run active on the current thread and
+do nothing outside one, so library code can be instrumented unconditionally.
+Runs nest: an inner ``run`` only times itself as a stage of the outer one.
+When the outermost run ends, its metrics dict is kept for ``last_run`` and,
+if ``PHANMEM_METRICS_FILE`` is set, appended to that file as one JSON line.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+METRICS_FILE_ENV = "PHANMEM_METRICS_FILE"
+
+
+class Metrics:
+    """Timers (count, total and max seconds) and counters of one run."""
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.started = time.time()
+        self.timers = {}
+        self.counters = {}
+
+    def add_time(self, name, seconds):
+        timer = self.timers.setdefault(name, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+        timer["count"] += 1
+        timer["total_s"] += seconds
+        timer["max_s"] = max(timer["max_s"], seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self):
+        return {
+            "run": self.name,
+            "labels": self.labels,
+            "started": self.started,
+            "timers": {name: {"count": t["count"], "total_s": round(t["total_s"], 6), "max_s": round(t["max_s"], 6)}
+                       for name, t in self.timers.items()},
+            "counters": dict(self.counters),
+        }
+
+
+_local = threading.local()
+_last_lock = threading.Lock()
+_last_runs = {}
+
+
+def current():
+    """The run active on this thread, or ``None``."""
+    return getattr(_local, "metrics", None)
+
+
+@contextlib.contextmanager
+def run(name, **labels):
+    """Collects metrics for ``name``; nested inside another run it becomes a timer."""
+    outer = current()
+    if outer is not None:
+        with timer(name):
+            yield outer
+        return
+
+    metrics = Metrics(name, **labels)
+    _local.metrics = metrics
+    started = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.add_time("total", time.perf_counter() - started)
+        _local.metrics = None
+        _finish(metrics.as_dict())
+
+
+@contextlib.contextmanager
+def timer(name):
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(name, time.perf_counter() - started)
+
+
+def count(name, n=1):
+    metrics = current()
+    if metrics is not None:
+        metrics.count(name, n)
+
+
+def _finish(result):
+    with _last_lock:
+        _last_runs[result["run"]] = result
+    path = os.getenv(METRICS_FILE_ENV)
+    if path:
+        with _last_lock, open(path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+def last_run(name):
+    """Metrics dict of the most recent finished run called ``name``, if any."""
+    with _last_lock:
+        return _last_runs.get(name)
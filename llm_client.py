@@ -0,0 +1,447 @@
+"""Chat-completion calls used by AI_Func and the result form.
+
+Every call goes through an on-disk SQLite cache keyed by a hash of the model,
+prompt and ``max_tokens``, so re-running an unchanged station ("Chọn lại")
+does not hit the network again. Below the cache sits a pluggable backend:
+
+- ``OpenAIBackend``: the real API (``OPENAI_API_BASE`` may point it at
+  ``llm_stub_server.py`` for offline load tests);
+- ``RecordingBackend``: forwards to another backend and appends every
+  exchange to a JSONL file;
+- ``ReplayBackend``: answers only from such a file.
+
+The backend is chosen with ``LLM_BACKEND`` (openai, record, replay) and
+``LLM_REPLAY_FILE``, or with ``set_backend``. Backends built from the
+environment are wrapped in ``ResilientBackend``, which bounds concurrent
+calls (``LLM_MAX_CONCURRENCY``), retries failures with jittered exponential
+backoff (``LLM_RETRIES``), coalesces identical in-flight prompts and keeps a
+latency histogram; ``OpenAIBackend`` applies a per-call ``LLM_TIMEOUT``.
+"""
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import dotenv
+
+import instrumentation
+
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+CACHE_PATH = "llm_cache.sqlite3"
+REPLAY_PATH = "llm_replay.jsonl"
+
+
+def make_key(model, prompt, max_tokens):
+    """Stable hash of everything that determines a reply."""
+    payload = json.dumps([model, prompt, max_tokens], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMError(Exception):
+    """An LLM call that failed for good (after retries, or not retryable)."""
+
+
+class OpenAIBackend:
+    """The OpenAI chat-completion API, keyed from ``OPENAI_API_KEY``."""
+
+    def __init__(self, api_key=None, api_base=None, timeout=30):
+        import openai
+
+        dotenv.load_dotenv()
+        openai.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        api_base = api_base or os.getenv("OPENAI_API_BASE")
+        if api_base:
+            openai.api_base = api_base
+        self.openai = openai
+        self.timeout = timeout
+
+    def complete(self, prompt, max_tokens=1000, model=DEFAULT_MODEL):
+        response = self.openai.ChatCompletion.create(
+            model=model,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            request_timeout=self.timeout
+        )
+        usage = response.get('usage') or {}
+        instrumentation.count("llm.prompt_tokens", usage.get('prompt_tokens', 0))
+        instrumentation.count("llm.completion_tokens", usage.get('completion_tokens', 0))
+        return response['choices'][0]['message']['content'].strip()
+
+    def stream(self, prompt, max_tokens=1000, model=DEFAULT_MODEL):
+        response = self.openai.ChatCompletion.create(
+            model=model,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            stream=True,
+            request_timeout=self.timeout
+        )
+        for chunk in response:
+            piece = chunk['choices'][0]['delta'].get('content')
+            if piece:
+                yield piece
+
+
+def load_recording(path):
+    """Reads a JSONL recording into a ``{key: content}`` dict (last entry wins)."""
+    replies = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    replies[entry["key"]] = entry["content"]
+    return replies
+
+
+class RecordingBackend:
+    """Forwards to ``inner`` and appends each exchange to a JSONL file."""
+
+    def __init__(self, inner, path=REPLAY_PATH):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    def complete(self, prompt, max_tokens=1000, model=DEFAULT_MODEL):
+        content = self.inner.complete(prompt, max_tokens, model)
+        self.record(prompt, max_tokens, model, content)
+        return content
+
+    def stream(self, prompt, max_tokens=1000, model=DEFAULT_MODEL):
+        pieces = []
+        for piece in stream_from(self.inner, prompt, max_tokens, model):
+            pieces.append(piece)
+            yield piece
+        self.record(prompt, max_tokens, model, "".join(pieces).strip())
+
+    def record(self, prompt, max_tokens, model, content):
+        entry = {"key": make_key(model, prompt, max_tokens), "model": model, "max_tokens": max_tokens,
+                 "prompt": prompt, "content": content}
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class ReplayBackend:
+    """Serves replies recorded by ``RecordingBackend``; never touches the network."""
+
+    def __init__(self, path=REPLAY_PATH):
+        self.path = path
+        self.replies = load_recording(path)
+
+    def complete(self, prompt, max_tokens=1000, model=DEFAULT_MODEL):
+        key = make_key(model, prompt, max_tokens)
+        if key not in self.replies:
+            raise KeyError(f"No recorded reply for prompt {key[:12]} in {self.path}")
+        return self.replies[key]
+
+
+def stream_from(backend, prompt, max_tokens=1000, model=DEFAULT_MODEL):
+    """Streams from ``backend`` when it can, otherwise yields its whole reply once."""
+    if hasattr(backend, "stream"):
+        yield from backend.stream(prompt, max_tokens, model)
+    else:
+        yield backend.complete(prompt, max_tokens, model)
+
+
+class LatencyHistogram:
+    """Counts of call latencies in fixed buckets (seconds), with rough percentiles."""
+
+    BOUNDS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, float("inf"))
+
+    def __init__(self):
+        self.counts = [0] * len(self.BOUNDS)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[next(i for i, bound in enumerate(self.BOUNDS) if seconds <= bound)] += 1
+            self.total += seconds
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile (0..1)."""
+        with self._lock:
+            calls = sum(self.counts)
+            seen = 0
+            for bound, count in zip(self.BOUNDS, self.counts):
+                seen += count
+                if calls and seen >= q * calls:
+                    return bound
+        return None
+
+    def snapshot(self):
+        with self._lock:
+            calls = sum(self.counts)
+            buckets = {(f"<={bound}s" if bound != float("inf") else f">{self.BOUNDS[-2]}s"): count
+                       for bound, count in zip(self.BOUNDS, self.counts)}
+            mean = self.total / calls if calls else None
+        return {"calls": calls, "mean_s": mean, "p50_s": self.percentile(0.5), "p95_s": self.percentile(0.95),
+                "buckets": buckets}
+
+
+RETRYABLE_OPENAI_ERRORS = {"Timeout", "APIError", "APIConnectionError", "RateLimitError", "ServiceUnavailableError",
+                           "TryAgain"}
+
+
+def is_retryable(error):
+    """Timeouts, connection problems, rate limits and 5xx; not bad keys or bad requests."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return type(error).__module__.startswith("openai") and type(error).__name__ in RETRYABLE_OPENAI_ERRORS
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.content = None
+        self.error = None
+
+
+class ResilientBackend:
+    """Wraps a backend with a concurrency limit, retries and request coalescing.
+
+    At most ``max_concurrency`` calls reach ``inner`` at once. A retryable
+    failure is retried up to ``retries`` times after a random sleep of up to
+    ``backoff * 2**attempt`` seconds (capped at ``max_backoff``). Callers
+    asking for a prompt that is already in flight wait for that call instead
+    of sending their own. Every attempt's latency goes to ``histogram``.
+    """
+
+    def __init__(self, inner, max_concurrency=4, retries=3, backoff=0.5, max_backoff=8.0):
+        self.inner = inner
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.histogram = LatencyHistogram()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _attempts(self, call):
+        for attempt in range(self.retries + 1):
+            with self._slots:
+                started = time.perf_counter()
+                try:
+                    return call()
+                except Exception as e:
+                    error = e
+                finally:
+                    self.histogram.observe(time.perf_counter() - started)
+            self._retry_or_raise(error, attempt)
+
+    def _retry_or_raise(self, error, attempt):
+        if not is_retryable(error) or attempt == self.retries:
+            raise LLMError(f"LLM call failed after {attempt + 1} attempt(s): {error}") from error
+        instrumentation.count("llm.retries")
+        time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def complete(self, prompt, max_tokens=1000, model=DEFAULT_MODEL):
+        key = make_key(model, prompt, max_tokens)
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+        if not leader:
+            instrumentation.count("llm.coalesced")
+            call.done.wait()
+        else:
+            try:
+                call.content = self._attempts(lambda: self.inner.complete(prompt, max_tokens, model))
+            except LLMError as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                call.done.set()
+        if call.error is not None:
+            raise call.error
+        return call.content
+
+    def stream(self, prompt, max_tokens=1000, model=DEFAULT_MODEL):
+        """Streams through one concurrency slot; retries only until the first piece arrives."""
+        for attempt in range(self.retries + 1):
+            received = False
+            with self._slots:
+                started = time.perf_counter()
+                try:
+                    for piece in stream_from(self.inner, prompt, max_tokens, model):
+                        received = True
+                        yield piece
+                    return
+                except Exception as e:
+                    if received:
+                        raise LLMError(f"LLM stream broke off: {e}") from e
+                    error = e
+                finally:
+                    self.histogram.observe(time.perf_counter() - started)
+            self._retry_or_raise(error, attempt)
+
+
+_backend = None
+
+
+def backend_from_env():
+    mode = os.getenv("LLM_BACKEND", "openai")
+    path = os.getenv("LLM_REPLAY_FILE", REPLAY_PATH)
+    timeout = float(os.getenv("LLM_TIMEOUT", 30))
+    if mode == "openai":
+        inner = OpenAIBackend(timeout=timeout)
+    elif mode == "record":
+        inner = RecordingBackend(OpenAIBackend(timeout=timeout), path)
+    elif mode == "replay":
+        inner = ReplayBackend(path)
+    else:
+        raise ValueError(f"Unknown LLM backend: {mode}")
+    return ResilientBackend(inner, max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 4)),
+                            retries=int(os.getenv("LLM_RETRIES", 3)))
+
+
+def get_backend():
+    """The process-wide backend, built from the environment on first use."""
+    global _backend
+    if _backend is None:
+        _backend = backend_from_env()
+    return _backend
+
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
+
+
+class ResponseCache:
+    """SQLite store of LLM replies with LRU and TTL eviction."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=5000, ttl=30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, content TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+
+    def get(self, key):
+        """Returns the cached reply or ``None``; expired entries count as misses."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, content):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, content, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, content, now, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+_cache = None
+
+
+def get_cache():
+    """The process-wide response cache, opened on first use."""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
+
+
+def set_cache(cache):
+    global _cache
+    _cache = cache
+
+
+def chat(prompt, max_tokens=1000, model=DEFAULT_MODEL, use_cache=True, store=True):
+    """Sends one user message and returns the stripped reply text.
+
+    With ``store=False`` a fresh reply is not cached; call ``remember`` once
+    the caller has accepted it.
+    """
+    cache = get_cache() if use_cache else None
+    key = make_key(model, prompt, max_tokens)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            instrumentation.count("llm.cache_hits")
+            return cached
+
+    instrumentation.count("llm.calls")
+    with instrumentation.timer("llm.latency"):
+        content = get_backend().complete(prompt, max_tokens, model)
+
+    if cache is not None and store:
+        cache.put(key, content)
+    return content
+
+
+def remember(prompt, content, max_tokens=1000, model=DEFAULT_MODEL):
+    """Caches a reply the caller has accepted for ``prompt``."""
+    get_cache().put(make_key(model, prompt, max_tokens), content)
+
+
+def chat_stream(prompt, max_tokens=1000, model=DEFAULT_MODEL, use_cache=True):
+    """Yields the reply in pieces as they arrive.
+
+    The full reply is cached only when the stream is read to the end, so a
+    cancelled request never leaves a truncated answer in the cache.
+    """
+    cache = get_cache() if use_cache else None
+    key = make_key(model, prompt, max_tokens)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            instrumentation.count("llm.cache_hits")
+            yield cached
+            return
+
+    instrumentation.count("llm.calls")
+    pieces = []
+    for piece in stream_from(get_backend(), prompt, max_tokens, model):
+        pieces.append(piece)
+        yield piece
+
+    if cache is not None:
+        cache.put(key, "".join(pieces).strip())
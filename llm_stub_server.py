@@ -0,0 +1,104 @@
+"""Local stand-in for the OpenAI chat-completion endpoint.
+
+Answers ``POST /v1/chat/completions`` after a configurable delay, from a
+recording made with ``LLM_BACKEND=record`` when the prompt is in it, or with
+a canned reply otherwise (the first ``Load_N`` listed in a balancing prompt).
+Requests with ``"stream": true`` get the reply as server-sent event chunks.
+Point the app at it with ``OPENAI_API_BASE=http://127.0.0.1:8765/v1``.
+
+    python llm_stub_server.py --port 8765 --latency 0.8 --replay llm_replay.jsonl
+"""
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_client import DEFAULT_MODEL, load_recording, make_key
+
+
+def canned_reply(prompt):
+    match = re.search(r"(Load_\d+)", prompt)
+    if match:
+        return match.group(1)
+    return "Không có"
+
+
+def make_handler(replies, latency, jitter):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            model = body.get("model", DEFAULT_MODEL)
+            prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+            content = replies.get(make_key(model, prompt, body.get("max_tokens")), None)
+            if content is None:
+                content = canned_reply(prompt)
+
+            time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+            if body.get("stream"):
+                self.send_stream(model, content)
+                return
+            payload = json.dumps({
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(prompt) + len(content)) // 4},
+            }, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def send_stream(self, model, content):
+            """Server-sent events the way the API streams: one delta per word, then ``[DONE]``."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            pieces = re.findall(r"\S+\s*|\s+", content) or [""]
+            for index, piece in enumerate(pieces):
+                chunk = {
+                    "id": "stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece} if index == 0
+                                 else {"content": piece}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            done = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def serve(host="127.0.0.1", port=8765, latency=0.5, jitter=0.0, replay=None):
+    replies = load_recording(replay) if replay else {}
+    server = ThreadingHTTPServer((host, port), make_handler(replies, latency, jitter))
+    print(f"LLM giả lập tại http://{host}:{server.server_port}/v1 (độ trễ {latency}s, {len(replies)} câu trả lời ghi sẵn)")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--replay", help="JSONL recording to answer from")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.latency, args.jitter, args.replay).serve_forever()
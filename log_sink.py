@@ -0,0 +1,120 @@
+"""In-memory log shared by the GUI thread and the worker threads.
+
+``print`` from ``AI_Func`` and the solvers goes through ``StreamRedirect``
+into ``LogSink``: whole lines become records in a fixed-size ring buffer,
+under a lock, so worker threads never touch a widget. A reader (the result
+form's text box) polls ``records_since`` on a timer and appends everything
+new in one go. The sink can also mirror every record to a rotating file.
+"""
+import itertools
+import logging
+import logging.handlers
+import sys
+import threading
+import time
+from collections import deque
+
+
+DEBUG, INFO, WARNING, ERROR = logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "CẢNH BÁO", ERROR: "LỖI"}
+
+
+class LogSink:
+    """Thread-safe ring buffer of ``(seq, created, level, text)`` records."""
+
+    def __init__(self, capacity=10000):
+        self.records = deque(maxlen=capacity)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._file_logger = None
+
+    def log(self, level, text):
+        with self._lock:
+            record = (next(self._seq), time.time(), level, text)
+            self.records.append(record)
+        if self._file_logger is not None:
+            self._file_logger.log(level, text)
+
+    def last_seq(self):
+        """Seq of the newest record, or 0 when the sink is empty."""
+        with self._lock:
+            return self.records[-1][0] if self.records else 0
+
+    def records_since(self, seq, min_level=DEBUG):
+        """Records newer than ``seq`` at or above ``min_level``, and the last seq seen.
+
+        Records already dropped from the ring buffer are skipped silently.
+        """
+        with self._lock:
+            if not self.records or self.records[-1][0] <= seq:
+                return seq, []
+            last = self.records[-1][0]
+            start = max(0, len(self.records) - (last - seq))
+            new = list(itertools.islice(self.records, start, None))
+        return last, [record for record in new if record[2] >= min_level]
+
+    def mirror_to(self, path, max_bytes=1_000_000, backups=3):
+        """Also writes every record to ``path``, rotating it at ``max_bytes``."""
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                       encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        logger = logging.getLogger(f"{__name__}.{id(self)}")
+        logger.setLevel(DEBUG)
+        logger.propagate = False
+        logger.addHandler(handler)
+        self._file_logger = logger
+
+
+class StreamRedirect:
+    """File-like object for ``sys.stdout``/``sys.stderr`` that logs whole lines.
+
+    Each thread has its own line buffer, so ``print`` calls from a worker and
+    from the GUI thread never end up on the same line. Writes are also passed
+    on to ``original`` (the console), when there is one.
+    """
+
+    def __init__(self, sink, level, original=None):
+        self.sink = sink
+        self.level = level
+        self.original = original
+        self._local = threading.local()
+
+    def write(self, text):
+        text = str(text)
+        if self.original is not None:
+            self.original.write(text)
+        buffer = getattr(self._local, "buffer", "") + text
+        *lines, buffer = buffer.split("\n")
+        self._local.buffer = buffer
+        if lines:
+            self.sink.log(self.level, "\n".join(lines))
+        return len(text)
+
+    def flush(self):
+        buffer = getattr(self._local, "buffer", "")
+        if buffer:
+            self._local.buffer = ""
+            self.sink.log(self.level, buffer)
+        if self.original is not None:
+            self.original.flush()
+
+    def isatty(self):
+        return False
+
+
+SINK = LogSink()
+
+
+def install(sink=SINK):
+    """Routes ``sys.stdout`` to ``sink`` at INFO and ``sys.stderr`` at ERROR (once)."""
+    if not isinstance(sys.stdout, StreamRedirect):
+        sys.stdout = StreamRedirect(sink, INFO, sys.stdout)
+    if not isinstance(sys.stderr, StreamRedirect):
+        sys.stderr = StreamRedirect(sink, ERROR, sys.stderr)
+
+
+def format_record(record):
+    _, _, level, text = record
+    if level == INFO:
+        return text
+    return f"[{LEVEL_NAMES.get(level, level)}] {text}"
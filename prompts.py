@@ -0,0 +1,75 @@
+"""Compact, token-budgeted prompts for the LLM load choice.
+
+The candidate table is rendered column-wise with pandas string operations,
+one short ``Tên|kWh|lệch`` line per load, and cut at the largest prefix of
+the (already priority-ordered) candidates that fits ``token_budget``. The
+prompt size, and so the latency of one balancing iteration, no longer grows
+with the number of loads on the feeder.
+
+Tokens are counted with ``tiktoken`` when it is installed, otherwise
+estimated as one token per 3 bytes of UTF-8 (Vietnamese diacritics make
+plain character counts too optimistic).
+"""
+import os
+
+import numpy as np
+
+try:
+    import tiktoken
+    HAS_TIKTOKEN = True
+except ImportError:
+    HAS_TIKTOKEN = False
+
+
+PROMPT_TOKENS_ENV = "LLM_PROMPT_TOKENS"
+DEFAULT_TOKEN_BUDGET = 1500
+CHOICE_MAX_TOKENS = 20
+
+_encodings = {}
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    if HAS_TIKTOKEN:
+        if model not in _encodings:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("cl100k_base")
+        return len(_encodings[model].encode(text))
+    return -(-len(text.encode("utf-8")) // 3)
+
+
+def token_budget():
+    """Prompt token budget from ``LLM_PROMPT_TOKENS``, default 1500."""
+    return int(os.getenv(PROMPT_TOKENS_ENV, DEFAULT_TOKEN_BUDGET))
+
+
+def candidate_lines(candidates, target):
+    """One ``Tên|kWh|lệch`` line per candidate, built column-wise."""
+    load = candidates["Tháng 9"].fillna(0).round().astype(np.int64)
+    gap = (candidates["Tháng 9"] - target).abs().fillna(0).round().astype(np.int64)
+    return (candidates["Tên"].astype(str) + "|" + load.astype(str) + "|" + gap.astype(str)).tolist()
+
+
+def choice_prompt(candidates, highest_phase, lowest_phase, target, conditions_text, budget=None):
+    """Builds the load-choice prompt; returns ``(prompt, tokens, candidates_used)``."""
+    budget = token_budget() if budget is None else budget
+    head = (
+        f"Bạn là một chuyên gia trong việc cân bằng tải lưới điện.\n"
+        f"Giúp tôi chọn tải tốt nhất để di chuyển từ pha cao nhất ({highest_phase}) "
+        f"đến pha thấp nhất ({lowest_phase}) để tối ưu hóa sự cân bằng, xem xét các điều kiện sau:\n\n"
+        f"{conditions_text}\n\n"
+        f"Giá trị mục tiêu: {round(target)} kWh. "
+        f"Các tải tiềm năng (Tên|Tải Tháng 9|Lệch so với mục tiêu, được sắp xếp theo thứ tự ưu tiên):\n"
+    )
+    tail = (
+        f"\nChọn **tên** của tải tốt nhất để di chuyển, đảm bảo nó đáp ứng tất cả các điều kiện. "
+        f"Chỉ trả lời tên tải, hoặc 'Không có' nếu không tìm thấy tải phù hợp."
+    )
+    lines = candidate_lines(candidates, target)
+    fixed = count_tokens(head + tail)
+    costs = np.cumsum([count_tokens(line + "\n") for line in lines]) if lines else np.zeros(0)
+    used = int(np.searchsorted(costs, budget - fixed, side="right"))
+    used = max(used, min(1, len(lines)))
+    prompt = head + "\n".join(lines[:used]) + tail
+    return prompt, count_tokens(prompt), used
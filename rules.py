@@ -0,0 +1,130 @@
+"""Balancing constraints from ``condition.docx``, compiled into boolean masks.
+
+The document holds a YAML block (between triple backticks) whose
+``constraints`` section is turned into a ``Rules`` object:
+
+- ``limited_load_movements.avoid_top_loads``: the N largest loads stay put;
+- ``limited_load_movements.max_moves_per_load``;
+- ``load_movement_threshold``: phase spread (kWh) that counts as balanced;
+- ``sudden_drop_avoidance.threshold``: loads whose consumption dropped by
+  more than this between two months stay put.
+
+``Rules.movable`` evaluates all of them over the whole station at once, so
+the solvers and the LLM prompt only ever see loads that may move. The parsed
+document is cached per path and modification time.
+"""
+import os
+import threading
+
+import numpy as np
+import yaml
+from docx import Document
+
+from anomalies import sudden_drop_flags
+
+
+# The app copies the user's file to condition.docx; the repo ships Condition.docx.
+CONDITIONS_PATHS = ("condition.docx", "Condition.docx")
+MOVABLE_COLUMN = "Được di chuyển"
+
+
+def load_conditions(file_path):
+    """Loads conditions from a .docx file.
+    Assumes YAML content is in a code block (within double backticks).
+    """
+    doc = Document(file_path)
+    yaml_content = ""
+
+    for paragraph in doc.paragraphs:
+        if paragraph.text.startswith("```") and paragraph.text.endswith("```"):
+            yaml_content = paragraph.text[3:-3]
+            break
+
+    if yaml_content:
+        conditions = yaml.safe_load(yaml_content)
+        return conditions
+    else:
+        raise ValueError("No YAML content found within code block in docx file.")
+
+
+def save_conditions(file_path, conditions):
+    """Saves conditions to a .docx file.
+    Saves YAML content within a code block (in double backticks).
+    """
+    doc = Document()
+    doc.add_paragraph(f"```\n{yaml.dump(conditions, allow_unicode=True)}\n```")
+    doc.save(file_path)
+
+
+class Rules:
+    """Per-load constraints, defaulting to the ones the LLM prompt used to spell out."""
+
+    def __init__(self, avoid_top_loads=3, max_moves_per_load=3, tolerance=200, sudden_drop_threshold=500,
+                 column="Tháng 9"):
+        self.avoid_top_loads = avoid_top_loads
+        self.max_moves_per_load = max_moves_per_load
+        self.tolerance = tolerance
+        self.sudden_drop_threshold = sudden_drop_threshold
+        self.column = column
+
+    @classmethod
+    def from_conditions(cls, conditions):
+        constraints = (conditions or {}).get("constraints") or {}
+        limits = constraints.get("limited_load_movements") or {}
+        drops = constraints.get("sudden_drop_avoidance") or {}
+        defaults = cls()
+        threshold = drops.get("threshold", defaults.sudden_drop_threshold)
+        return cls(
+            avoid_top_loads=int(limits.get("avoid_top_loads", defaults.avoid_top_loads) or 0),
+            max_moves_per_load=int(limits.get("max_moves_per_load", defaults.max_moves_per_load)),
+            tolerance=float(constraints.get("load_movement_threshold", defaults.tolerance)),
+            sudden_drop_threshold=None if threshold is None else float(threshold),
+        )
+
+    def sudden_drops(self, df):
+        return sudden_drop_flags(df, threshold=self.sudden_drop_threshold)
+
+    def top_loads(self, df):
+        """True for the ``avoid_top_loads`` largest loads of the month."""
+        mask = np.zeros(len(df), dtype=bool)
+        if self.avoid_top_loads > 0:
+            values = np.nan_to_num(df[self.column].to_numpy(dtype=float, na_value=np.nan), nan=-np.inf)
+            top = min(self.avoid_top_loads, len(values))
+            mask[np.argpartition(-values, top - 1)[:top]] = True
+        return mask
+
+    def movable(self, df, drops=None):
+        """Loads that no constraint pins to their phase."""
+        drops = self.sudden_drops(df).to_numpy(dtype=bool) if drops is None else np.asarray(drops, dtype=bool)
+        return ~self.top_loads(df) & ~drops
+
+    def describe(self):
+        """The constraints as a line for the LLM prompt."""
+        return (f"Các tải dưới đây đã loại trừ {self.avoid_top_loads} tải cao nhất và các tải giảm đột ngột "
+                f"quá {self.sudden_drop_threshold} kWh; mỗi tải được chuyển tối đa {self.max_moves_per_load} lần.")
+
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def load_rules(path=None):
+    """``Rules`` from ``path`` (or the first condition file found), re-read only when it changes.
+
+    Without a conditions file the defaults of ``Rules`` apply.
+    """
+    if path is None:
+        path = next((candidate for candidate in CONDITIONS_PATHS if os.path.exists(candidate)), None)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        return Rules()
+    key = os.path.abspath(path)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    rules = Rules.from_conditions(load_conditions(path))
+    with _lock:
+        _cache[key] = (mtime, rules)
+    return rules
@@ -0,0 +1,186 @@
+"""Fast loading of station workbooks and the shared in-memory station data.
+
+Parsing ``.xlsx`` with openpyxl is the slowest I/O in the app, and the same
+``table1.xlsx`` is read by several forms for one user flow. ``read_station``
+converts each workbook once into a columnar file under ``.station_cache/``,
+keyed on the workbook's path, mtime and size, and loads that file afterwards.
+Feather (memory-mapped) is used when pyarrow is installed, pickle otherwise.
+
+The app's own stations live in the SQLite store (``station_store``):
+``station_view`` reads them from there, importing the legacy
+``table1.xlsx``/``table2.xlsx`` the first time, and edits go through the
+store. ``REGISTRY`` only keeps one typed DataFrame per workbook path for
+``AI_Func(path=...)``, re-read (and its version bumped) when the file
+changes. Both hand out copy-on-write views of their shared frames.
+"""
+import contextlib
+import hashlib
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+import instrumentation
+from anomalies import month_columns
+from station_store import copy_on_write, get_store
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+
+CACHE_DIR = ".station_cache"
+
+STATION_FILES = {
+    "Lê Ngọc Hân ": "table1.xlsx",
+    "Điều kiện xác định": "table2.xlsx",
+}
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def _cache_paths(fingerprint):
+    path, mtime, size = fingerprint
+    prefix = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+    version = hashlib.sha1(f"{mtime}:{size}".encode()).hexdigest()[:16]
+    return prefix, os.path.join(CACHE_DIR, f"{prefix}-{version}")
+
+
+def _load_cached(base):
+    # Another process may prune the file between the check and the read.
+    try:
+        if HAS_ARROW and os.path.exists(base + ".feather"):
+            return pd.read_feather(base + ".feather", memory_map=True)
+        if os.path.exists(base + ".pkl"):
+            return pd.read_pickle(base + ".pkl")
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def _write_atomic(path, write):
+    """Writes through a temporary file and ``os.replace``, so readers never see a partial file."""
+    handle, temporary = tempfile.mkstemp(prefix=".tmp-", dir=CACHE_DIR)
+    os.close(handle)
+    try:
+        write(temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporary)
+        raise
+
+
+def _store_cached(prefix, base, df):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    written = base + ".pkl"
+    if HAS_ARROW:
+        try:
+            _write_atomic(base + ".feather", df.to_feather)
+            written = base + ".feather"
+        except (TypeError, ValueError, pyarrow.ArrowException):
+            _write_atomic(written, df.to_pickle)
+    else:
+        _write_atomic(written, df.to_pickle)
+    # Older versions of this workbook; a concurrent process may already have removed them.
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        if name.startswith(prefix + "-") and path != written:
+            with contextlib.suppress(OSError):
+                os.remove(path)
+
+
+def read_station(path):
+    """Reads a station workbook, from the columnar cache when it is current."""
+    prefix, base = _cache_paths(_fingerprint(path))
+    with instrumentation.timer("station.cache_load"):
+        df = _load_cached(base)
+    if df is None:
+        with instrumentation.timer("excel.parse"):
+            df = pd.read_excel(path)
+        _store_cached(prefix, base, df)
+    df.attrs["path"] = path
+    return df
+
+
+def typed(df):
+    """Month readings as numbers, the way AI_Func expects them."""
+    df = df.copy()
+    for column in month_columns(df.columns):
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df
+
+
+class DatasetRegistry:
+    """One parsed, typed DataFrame per workbook path.
+
+    ``view`` hands out copy-on-write views (pandas >= 3, or 2.x with the
+    option turned on) and deep copies otherwise, so callers may modify what
+    they receive without touching the shared copy. The file is re-read only
+    when its mtime or size changes, which bumps the path's version; views
+    carry it in ``attrs["version"]``.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _current(self, path):
+        fingerprint = _fingerprint(path)
+        entry = self._entries.get(fingerprint[0])
+        if entry is None or entry["fingerprint"] != fingerprint:
+            version = 1 if entry is None else entry["version"] + 1
+            df = typed(read_station(path))
+            df.attrs["version"] = version
+            entry = {"df": df, "fingerprint": fingerprint, "version": version}
+            self._entries[fingerprint[0]] = entry
+        return entry
+
+    def view(self, path):
+        with self._lock:
+            df = self._current(path)["df"]
+        return df.copy(deep=not copy_on_write())
+
+
+REGISTRY = DatasetRegistry()
+
+
+def station_key(selected_text):
+    """Store key of a station combo entry (``"table1"``), or None."""
+    path = STATION_FILES.get(selected_text)
+    return None if path is None else os.path.splitext(path)[0]
+
+
+def import_station(key, df, source=None):
+    """Stores ``df`` as station ``key`` in one transaction."""
+    get_store().import_frame(key, typed(df), source)
+
+
+def station_view(selected_text, default=None):
+    """The station behind a combo entry, from the store, or ``default`` if it has no data."""
+    key = station_key(selected_text)
+    if key is None:
+        return default
+    store = get_store()
+    path = STATION_FILES[selected_text]
+    if not store.has(key):
+        if not os.path.exists(path):
+            return default
+        import_station(key, read_station(path), path)
+    df = store.frame(key)
+    df.attrs["path"] = path
+    return df
+
+
+def save_plan(selected_text, changes, solver=None, metrics=None):
+    """Stores a balancing plan of the station behind a combo entry; returns its id or None."""
+    key = station_key(selected_text)
+    store = get_store()
+    if key is None or not store.has(key):
+        return None
+    return store.save_plan(key, changes, solver, metrics)
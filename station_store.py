@@ -0,0 +1,326 @@
+"""Local SQLite store for stations, customers, monthly readings and balancing plans.
+
+Replaces the ``table1.xlsx``/``table2.xlsx``/``table3.xlsx`` shuffle: an
+import is one transaction, saving a phase checkpoint ("Cân đảo pha") and
+reverting to it ("Chọn lại") are single indexed ``UPDATE``/``INSERT ...
+SELECT`` statements, and a plan only stores the loads it moves. Every write
+bumps the station's version, which keys the in-memory DataFrame cache.
+
+Plans are diffs against the dataset version they were computed on:
+``(row, old_phase, new_phase)`` per moved load plus their metrics. Listing,
+comparing, applying and undoing a plan only touch its moves, so they cost
+O(moves) whatever the size of the station or the length of the history.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from anomalies import MONTH_PATTERN
+
+STORE_PATH = "stations.sqlite3"
+
+PANDAS_MAJOR = int(pd.__version__.split(".")[0])
+
+# Workbook columns kept in their own indexed/typed fields; anything else
+# (apart from the month readings) goes to ``extra`` as JSON.
+FIELDS = {"Tên": "name", "Khách hàng": "customer", "Mã KH": "code", "Số công tơ": "meter",
+          "Sổ ghi số": "book", "Pha": "phase"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, source TEXT, columns TEXT NOT NULL,
+    imported REAL NOT NULL, version INTEGER NOT NULL DEFAULT 1, dataset_version INTEGER NOT NULL DEFAULT 1);
+CREATE TABLE IF NOT EXISTS customers (
+    station_id INTEGER NOT NULL REFERENCES stations(id) ON DELETE CASCADE, row INTEGER NOT NULL,
+    name, customer, code, meter, book, phase, extra TEXT,
+    PRIMARY KEY (station_id, row)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS customers_name ON customers (station_id, name);
+CREATE TABLE IF NOT EXISTS readings (
+    station_id INTEGER NOT NULL REFERENCES stations(id) ON DELETE CASCADE, row INTEGER NOT NULL,
+    month INTEGER NOT NULL, kwh,
+    PRIMARY KEY (station_id, row, month)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS checkpoints (
+    station_id INTEGER NOT NULL REFERENCES stations(id) ON DELETE CASCADE, row INTEGER NOT NULL, phase,
+    PRIMARY KEY (station_id, row)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY, station_id INTEGER NOT NULL REFERENCES stations(id) ON DELETE CASCADE,
+    created REAL NOT NULL, solver TEXT, base_version INTEGER, metrics TEXT, applied REAL);
+CREATE INDEX IF NOT EXISTS plans_station ON plans (station_id, id);
+CREATE INDEX IF NOT EXISTS plans_applied ON plans (station_id, applied);
+CREATE TABLE IF NOT EXISTS plan_moves (
+    plan_id INTEGER NOT NULL REFERENCES plans(id) ON DELETE CASCADE, row INTEGER NOT NULL,
+    old_phase, new_phase,
+    PRIMARY KEY (plan_id, row)) WITHOUT ROWID;
+"""
+
+
+# Columns added after the first release of the store.
+MIGRATIONS = {
+    "stations": {"dataset_version": "INTEGER NOT NULL DEFAULT 1"},
+    "plans": {"base_version": "INTEGER", "metrics": "TEXT", "applied": "REAL"},
+}
+
+
+class PlanConflict(ValueError):
+    """The station no longer has the phases a plan was computed from."""
+
+
+def _value(value):
+    """Plain Python value for sqlite3: blank cells (NaN, NA, NaT) become NULL, dates ISO strings."""
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value.item() if hasattr(value, "item") else value
+
+
+def copy_on_write():
+    """True when pandas copies lazily (always from 3.0; opt-in on 2.x)."""
+    return PANDAS_MAJOR >= 3 or (PANDAS_MAJOR == 2 and pd.get_option("mode.copy_on_write") is True)
+
+
+class StationStore:
+    """Thread-safe access to one store file; ``frame`` results are cached per station version."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._frames = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._migrate()
+        self._db.executescript(SCHEMA)
+
+    def _migrate(self):
+        for table, columns in MIGRATIONS.items():
+            existing = {row[1] for row in self._db.execute(f"PRAGMA table_info({table})")}
+            if existing:
+                for column, declaration in columns.items():
+                    if column not in existing:
+                        self._db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+    def _station_id(self, key):
+        row = self._db.execute("SELECT id FROM stations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown station: {key}")
+        return row[0]
+
+    def _bump(self, station_id):
+        self._db.execute("UPDATE stations SET version = version + 1 WHERE id = ?", (station_id,))
+
+    def has(self, key):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM stations WHERE key = ?", (key,)).fetchone() is not None
+
+    def version(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT version FROM stations WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def import_frame(self, key, df, source=None):
+        """Replaces the station's customers and readings with ``df`` in one transaction."""
+        columns = [str(column) for column in df.columns]
+        months = {column: int(match.group(1)) for column in columns if (match := MONTH_PATTERN.match(column))}
+        others = [column for column in columns if column not in FIELDS and column not in months]
+        records = df.to_dict("list")
+
+        customers = []
+        readings = []
+        for row in range(len(df)):
+            fields = [_value(records[column][row]) if column in records else None for column in FIELDS]
+            extra = json.dumps({column: _value(records[column][row]) for column in others},
+                               ensure_ascii=False, default=str) if others else None
+            customers.append((row, *fields, extra))
+            readings.extend((row, month, _value(records[column][row])) for column, month in months.items())
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO stations (key, source, columns, imported) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET source = excluded.source, columns = excluded.columns,"
+                " imported = excluded.imported, version = version + 1, dataset_version = version + 1",
+                (key, source, json.dumps(columns, ensure_ascii=False), time.time()))
+            station_id = self._station_id(key)
+            for table in ("customers", "readings", "checkpoints"):
+                self._db.execute(f"DELETE FROM {table} WHERE station_id = ?", (station_id,))
+            self._db.executemany(
+                "INSERT INTO customers (station_id, row, name, customer, code, meter, book, phase, extra)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", ((station_id, *customer) for customer in customers))
+            self._db.executemany("INSERT INTO readings (station_id, row, month, kwh) VALUES (?, ?, ?, ?)",
+                                 ((station_id, *reading) for reading in readings))
+
+    def frame(self, key):
+        """The station as a DataFrame with the columns, in the order, it was imported with.
+
+        Callers get a copy-on-write view of the cached frame (a deep copy
+        when pandas copies eagerly); ``attrs["version"]`` is its version.
+        """
+        with self._lock:
+            station_id, columns, version = self._db.execute(
+                "SELECT id, columns, version FROM stations WHERE key = ?", (key,)).fetchone()
+            cached = self._frames.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1].copy(deep=not copy_on_write())
+            customers = pd.read_sql_query(
+                "SELECT row, name, customer, code, meter, book, phase, extra FROM customers"
+                " WHERE station_id = ? ORDER BY row", self._db, params=(station_id,), index_col="row")
+            readings = pd.read_sql_query("SELECT row, month, kwh FROM readings WHERE station_id = ?",
+                                         self._db, params=(station_id,))
+
+        columns = json.loads(columns)
+        df = customers.rename(columns={field: column for column, field in FIELDS.items()})
+        if readings.size:
+            months = readings.pivot(index="row", columns="month", values="kwh").reindex(df.index)
+            for month in months.columns:
+                df[f"Tháng {month}"] = months[month]
+        if df["extra"].notna().any():
+            extra = pd.DataFrame([json.loads(value) if value else {} for value in df["extra"]], index=df.index)
+            df = df.join(extra)
+        df = df[[column for column in columns if column in df.columns]].reset_index(drop=True)
+        df.columns.name = None
+        df.attrs["version"] = version
+        with self._lock:
+            self._frames[key] = (version, df)
+        return df.copy(deep=not copy_on_write())
+
+    def set_phases(self, key, changes):
+        """Applies ``(row, old_phase, new_phase)`` changes to the stored phases."""
+        with self._lock, self._db:
+            station_id = self._station_id(key)
+            self._db.executemany("UPDATE customers SET phase = ? WHERE station_id = ? AND row = ?",
+                                 ((_value(new), station_id, int(row)) for row, _, new in changes))
+            self._bump(station_id)
+
+    def checkpoint(self, key):
+        """Remembers the current phases; ``revert`` goes back to them."""
+        with self._lock, self._db:
+            station_id = self._station_id(key)
+            self._db.execute("DELETE FROM checkpoints WHERE station_id = ?", (station_id,))
+            self._db.execute("INSERT INTO checkpoints (station_id, row, phase)"
+                             " SELECT station_id, row, phase FROM customers WHERE station_id = ?", (station_id,))
+
+    def revert(self, key):
+        """Restores the phases of the last checkpoint (no-op without one)."""
+        with self._lock, self._db:
+            station_id = self._station_id(key)
+            self._db.execute(
+                "UPDATE customers SET phase = (SELECT c.phase FROM checkpoints c"
+                " WHERE c.station_id = customers.station_id AND c.row = customers.row)"
+                " WHERE station_id = ? AND EXISTS (SELECT 1 FROM checkpoints c"
+                " WHERE c.station_id = customers.station_id AND c.row = customers.row)", (station_id,))
+            self._bump(station_id)
+
+    def save_plan(self, key, changes, solver=None, metrics=None):
+        """Stores a balancing plan against the current version and returns its id.
+
+        ``changes`` holds only the moved loads, ``metrics`` any JSON-able summary
+        (PUI before/after, ...).
+        """
+        with self._lock, self._db:
+            station_id = self._station_id(key)
+            plan_id = self._db.execute(
+                "INSERT INTO plans (station_id, created, solver, base_version, metrics)"
+                " SELECT id, ?, ?, version, ? FROM stations WHERE id = ?",
+                (time.time(), solver, json.dumps(metrics, ensure_ascii=False, default=float) if metrics else None,
+                 station_id)).lastrowid
+            self._db.executemany("INSERT INTO plan_moves (plan_id, row, old_phase, new_phase) VALUES (?, ?, ?, ?)",
+                                 ((plan_id, int(row), _value(old), _value(new)) for row, old, new in changes))
+        return plan_id
+
+    def plan(self, plan_id):
+        """``[(row, old_phase, new_phase), ...]`` of a stored plan."""
+        with self._lock:
+            return self._db.execute("SELECT row, old_phase, new_phase FROM plan_moves WHERE plan_id = ? ORDER BY row",
+                                    (plan_id,)).fetchall()
+
+    def plans(self, key):
+        """Every plan of the station, newest first, as dicts with its move count and metrics.
+
+        ``stale`` plans were computed on data that has been re-imported since.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT p.id, p.created, p.solver, COUNT(m.row), p.base_version, p.metrics, p.applied,"
+                " p.base_version < s.dataset_version FROM plans p JOIN stations s ON s.id = p.station_id"
+                " LEFT JOIN plan_moves m ON m.plan_id = p.id"
+                " WHERE s.key = ? GROUP BY p.id ORDER BY p.id DESC", (key,)).fetchall()
+        return [{"id": plan_id, "created": created, "solver": solver, "moves": moves, "base_version": base,
+                 "metrics": json.loads(metrics) if metrics else {}, "applied": applied, "stale": bool(stale)}
+                for plan_id, created, solver, moves, base, metrics, applied, stale in rows]
+
+    def compare_plans(self, first, second):
+        """``(row, phase_in_first, phase_in_second)`` for every load the two plans place differently."""
+        first = {row: (old, new) for row, old, new in self.plan(first)}
+        second = {row: (old, new) for row, old, new in self.plan(second)}
+        differences = []
+        for row in sorted(first.keys() | second.keys()):
+            phase_first = first[row][1] if row in first else second[row][0]
+            phase_second = second[row][1] if row in second else first[row][0]
+            if phase_first != phase_second:
+                differences.append((row, phase_first, phase_second))
+        return differences
+
+    def _switch(self, plan_id, undo):
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT p.station_id, p.base_version < s.dataset_version, p.applied FROM plans p"
+                " JOIN stations s ON s.id = p.station_id WHERE p.id = ?", (plan_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Unknown plan: {plan_id}")
+            station_id, stale, applied = row
+            if stale:
+                raise PlanConflict(f"Plan {plan_id} was made for data that has been re-imported")
+            if (applied is None) == undo:
+                return []
+            moves = self.plan(plan_id)
+            if undo:
+                moves = [(row, new, old) for row, old, new in moves]
+            for row, expected, _ in moves:
+                current = self._db.execute("SELECT phase FROM customers WHERE station_id = ? AND row = ?",
+                                           (station_id, row)).fetchone()
+                if current is None or current[0] != expected:
+                    raise PlanConflict(f"Row {row} is no longer on phase {expected}")
+            self._db.executemany("UPDATE customers SET phase = ? WHERE station_id = ? AND row = ?",
+                                 ((new, station_id, row) for row, _, new in moves))
+            self._db.execute("UPDATE plans SET applied = ? WHERE id = ?", (None if undo else time.time(), plan_id))
+            self._bump(station_id)
+        return moves
+
+    def apply_plan(self, plan_id):
+        """Moves the plan's loads to their new phases; returns the applied ``(row, old, new)`` moves.
+
+        Raises ``PlanConflict`` if a load is not on the phase the plan expects.
+        """
+        return self._switch(plan_id, undo=False)
+
+    def undo_plan(self, plan_id):
+        """Puts the loads of an applied plan back; returns the reversed moves."""
+        return self._switch(plan_id, undo=True)
+
+    def last_applied(self, key):
+        """Id of the most recently applied plan of the station, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT p.id FROM plans p JOIN stations s ON s.id = p.station_id"
+                " WHERE s.key = ? AND p.applied IS NOT NULL ORDER BY p.applied DESC LIMIT 1", (key,)).fetchone()
+        return row[0] if row else None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide store, opened on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StationStore(os.getenv("PHANMEM_STORE", STORE_PATH))
+    return _store
@@ -0,0 +1,146 @@
+"""What-if sweep: balance one station for every combination of parameters.
+
+    python sweep.py table1.xlsx --voltage 220 230 --cosphi 0.85 0.9 1 --max-current 1 2 3 --max-moves 1 2 3 4
+
+Each scenario runs a local solver (no LLM) on a process pool. The station is
+sent to each worker once, through the pool initializer, and every task only
+carries its parameters. The result is one row per scenario with the number
+of moved loads, PUI before/after, current deviation and neutral current.
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from balancing import SOLVERS
+from engine import phase_report
+from rules import MOVABLE_COLUMN, load_rules
+from station_data import read_station, typed
+
+
+PARAMETERS = ("voltage", "cosphi", "max_current", "max_load_change")
+COLUMNS = {
+    "voltage": "Điện áp (V)",
+    "cosphi": "cos φ",
+    "max_current": "Sai số dòng tối đa (A)",
+    "max_load_change": "Số tải tối đa",
+    "moves": "Số tải di chuyển",
+    "moved": "Tải di chuyển",
+    "PUI_old": "PUI trước (%)",
+    "PUI_new": "PUI sau (%)",
+    "max_diff_new": "Độ lệch dòng sau (A)",
+    "neutral_new": "Dòng trung tính sau (A)",
+    "seconds": "Thời gian (s)",
+}
+
+
+def parse_values(text, cast=float):
+    """``"0.85, 0.9 1"`` -> ``[0.85, 0.9, 1.0]``; an empty string gives no values."""
+    return [cast(value) for value in text.replace(",", " ").split()]
+
+
+def scenario_grid(voltage, cosphi, max_current, max_load_change):
+    """Every combination of the given value lists, as parameter dicts."""
+    return [dict(zip(PARAMETERS, values))
+            for values in itertools.product(voltage, cosphi, max_current, max_load_change)]
+
+
+def prepare(df):
+    """The columns AI_Func adds before solving, computed once for all scenarios."""
+    df = typed(df)
+    if "Pha hiện tại" not in df.columns:
+        df["Pha hiện tại"] = df["Pha"].copy()
+    rules = load_rules()
+    df["Giảm đột ngột"] = rules.sudden_drops(df)
+    df[MOVABLE_COLUMN] = rules.movable(df, df["Giảm đột ngột"])
+    return df
+
+
+_station = None
+
+
+def _init_worker(df):
+    """Keeps the station for this worker process and silences the solvers' prints."""
+    global _station
+    _station = df
+    sys.stdout = open(os.devnull, "w", encoding="utf-8")
+
+
+def run_scenario(scenario, solver="greedy", df=None, **solver_options):
+    """Balances ``df`` (or the worker's station) for one scenario and returns its result row."""
+    df = _station if df is None else df
+    started = time.perf_counter()
+    df_balanced = SOLVERS[solver](df.copy(), **scenario, **solver_options)
+    report = phase_report(df_balanced, scenario["voltage"], scenario["cosphi"])
+    moved = df_balanced.loc[df_balanced['Pha hiện tại'] != df_balanced['Pha đề xuất'], 'Tên']
+    return {
+        **scenario,
+        "moves": len(moved),
+        "moved": ", ".join(map(str, moved)),
+        "PUI_old": report["PUI_old"],
+        "PUI_new": report["PUI_new"],
+        "max_diff_new": round(report["max_diff_new"], 3),
+        "neutral_new": round(report["neutral_new"], 3),
+        "seconds": round(time.perf_counter() - started, 4),
+    }
+
+
+def sweep(df, scenarios, solver="greedy", workers=None, on_progress=None, **solver_options):
+    """Runs every scenario and returns the results, best PUI first.
+
+    ``workers=1`` runs in this process, where the solvers' prints reach the
+    log as usual; pool workers discard them. ``on_progress(done, total)``
+    is called as scenarios finish.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Sweeps need a local solver, not: {solver}")
+    df = prepare(df)
+    solver_options = {"max_moves_per_load": load_rules().max_moves_per_load, **solver_options}
+    workers = min(workers or os.cpu_count() or 1, len(scenarios)) or 1
+    rows = []
+    if workers == 1:
+        for scenario in scenarios:
+            rows.append(run_scenario(scenario, solver, df, **solver_options))
+            if on_progress is not None:
+                on_progress(len(rows), len(scenarios))
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(df,)) as pool:
+            futures = [pool.submit(run_scenario, scenario, solver, **solver_options) for scenario in scenarios]
+            for future in as_completed(futures):
+                rows.append(future.result())
+                if on_progress is not None:
+                    on_progress(len(rows), len(scenarios))
+
+    result = pd.DataFrame(rows, columns=list(COLUMNS))
+    return result.sort_values(["PUI_new", "moves"], ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cân bằng pha với nhiều bộ thông số")
+    parser.add_argument("path", help="station workbook (.xlsx)")
+    parser.add_argument("--solver", default="greedy", choices=list(SOLVERS))
+    parser.add_argument("--voltage", type=float, nargs="+", default=[220])
+    parser.add_argument("--cosphi", type=float, nargs="+", default=[1])
+    parser.add_argument("--max-current", type=float, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--max-moves", type=int, nargs="+", default=[1, 2, 3, 4, 5])
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--out", help="write the table here (.csv or .xlsx) instead of stdout")
+    args = parser.parse_args(argv)
+
+    scenarios = scenario_grid(args.voltage, args.cosphi, args.max_current, args.max_moves)
+    result = sweep(read_station(args.path), scenarios, args.solver, args.workers).rename(columns=COLUMNS)
+    if args.out and args.out.endswith(".xlsx"):
+        result.to_excel(args.out, index=False)
+    elif args.out:
+        result.to_csv(args.out, index=False)
+    else:
+        print(result.to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from anomalies import consecutive_month_pairs, sudden_drop_flags
+
+
+def station():
+    return pd.DataFrame({
+        "Tên": ["a", "b", "c", "d", "e", "f"],
+        "Tháng 6": [1000, 1000, 300, 2000, 100, 50],
+        "Tháng 7": [1000, 400, 300, 1900, 100, 50],
+        "Tháng 8": [1000, 400, 300, 1800, 700, 50],
+        "Tháng 9": [1000, 400, "30", 1100, 700, None],
+        "Pha": ["A", "B", "C", "A", "B", "C"],
+    })
+
+
+def test_consecutive_month_pairs_skip_gaps():
+    assert consecutive_month_pairs(["Tên", "Tháng 9", "Tháng 6", "Tháng 7"]) == [("Tháng 6", "Tháng 7")]
+
+
+def test_sudden_drop_flags_absolute_and_relative():
+    df = station()
+
+    assert sudden_drop_flags(df).tolist() == [False, True, False, True, False, False]
+    assert sudden_drop_flags(df, threshold=None, relative_threshold=0.5).tolist() == [
+        False, True, True, False, False, False]
+    assert sudden_drop_flags(df, month_pairs=[("Tháng 6", "Tháng 7")]).tolist() == [
+        False, True, False, False, False, False]
+
+
+def test_sudden_drop_flags_without_consecutive_months():
+    df = station()[["Tên", "Tháng 6", "Tháng 9"]]
+
+    assert not sudden_drop_flags(df).any()
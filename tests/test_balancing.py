@@ -0,0 +1,58 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from balancing import _plan_spread, greedy_balance, min_moves_plan, phase_sums
+from bench import generate_station
+from rules import MOVABLE_COLUMN
+
+
+def test_greedy_balance_reduces_spread_and_keeps_pinned_loads():
+    df = generate_station(200, seed=1)
+    df[MOVABLE_COLUMN] = np.arange(len(df)) % 4 != 0
+
+    result = greedy_balance(df)
+
+    before = df.groupby("Pha")["Tháng 9"].sum()
+    after = result.groupby("Pha đề xuất")["Tháng 9"].sum()
+    assert after.max() - after.min() < before.max() - before.min()
+    pinned = ~df[MOVABLE_COLUMN]
+    assert (result.loc[pinned, "Pha đề xuất"] == result.loc[pinned, "Pha hiện tại"]).all()
+
+
+def brute_force_moves(loads, codes, tolerance, max_moves, allowed):
+    """Fewest moves reaching ``tolerance``, by trying every subset and target phase."""
+    rows = [row for row in range(len(loads)) if allowed[row] and loads[row] > 0]
+    for k in range(max_moves + 1):
+        for subset in itertools.combinations(rows, k):
+            options = [[q for q in range(3) if q != codes[row]] for row in subset]
+            for targets in itertools.product(*options):
+                moved = codes.copy()
+                moved[list(subset)] = targets
+                sums = phase_sums(loads, moved)
+                if sums.max() - sums.min() <= tolerance:
+                    return k
+    return None
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_min_moves_plan_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(3, 8))
+    loads = rng.integers(1, 400, n).astype(float)
+    codes = rng.integers(0, 3, n)
+    allowed = rng.random(n) > 0.2
+    tolerance = float(rng.integers(20, 150))
+
+    expected = brute_force_moves(loads, codes, tolerance, 3, allowed)
+    moves, spread, optimal = min_moves_plan(loads, codes, tolerance, max_moves=3, allowed=allowed)
+
+    assert all(allowed[row] for row, _, _ in moves)
+    assert spread == pytest.approx(_plan_spread(loads, codes, moves))
+    if expected is None:
+        assert spread > tolerance
+    else:
+        assert optimal
+        assert spread <= tolerance
+        assert len(moves) == expected
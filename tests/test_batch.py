@@ -0,0 +1,54 @@
+import json
+import os
+
+from batch import RESULTS_FILE, read_manifest, run_batch, unique_names
+from bench import generate_station
+
+
+def write_station(path, seed=0):
+    generate_station(40, seed=seed).to_excel(path, index=False)
+    return str(path)
+
+
+def recorded(out_dir):
+    with open(os.path.join(out_dir, RESULTS_FILE), encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def test_unique_names_suffixes_repeats():
+    stations = [("tram", "a.xlsx"), ("tram", "b.xlsx"), ("tram-2", "c.xlsx"), ("tram", "d.xlsx")]
+
+    assert [name for name, _ in unique_names(stations)] == ["tram", "tram-3", "tram-2", "tram-4"]
+
+
+def test_read_manifest_resolves_relative_paths(tmp_path):
+    manifest = tmp_path / "danhsach.txt"
+    manifest.write_text("# trạm\ntram/a.xlsx\n/data/a.xlsx\n", encoding="utf-8")
+
+    assert read_manifest(str(manifest)) == [("a", str(tmp_path / "tram" / "a.xlsx")), ("a-2", "/data/a.xlsx")]
+
+
+def test_resume_only_reruns_unfinished_stations(tmp_path):
+    good = write_station(tmp_path / "good.xlsx")
+    missing = str(tmp_path / "late.xlsx")
+    stations = [("good", good), ("late", missing)]
+    out_dir = str(tmp_path / "out")
+
+    summary = run_batch(stations, out_dir, workers=1)
+    assert summary.set_index("station").loc[["good", "late"], "error"].isna().tolist() == [True, False]
+
+    write_station(missing, seed=1)
+    summary = run_batch(stations, out_dir, workers=1, resume=True)
+
+    assert sorted(row["station"] for row in recorded(out_dir)) == ["good", "late", "late"]
+    assert len(summary) == 2 and summary["error"].isna().all()
+    assert sorted(os.listdir(os.path.join(out_dir, "plans"))) == ["good.json", "late.json"]
+
+
+def test_without_resume_results_start_over(tmp_path):
+    stations = [("good", write_station(tmp_path / "good.xlsx"))]
+    out_dir = str(tmp_path / "out")
+    run_batch(stations, out_dir, workers=1)
+    run_batch(stations, out_dir, workers=1)
+
+    assert len(recorded(out_dir)) == 1
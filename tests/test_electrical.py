@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from electrical import electrical_metrics, neutral_current, phase_currents, pui
+
+
+def test_pui_of_known_currents():
+    currents = np.array([[10.0], [20.0], [30.0]])
+
+    assert pui(currents) == pytest.approx([100.0])
+    assert pui(np.zeros((3, 1))) == pytest.approx([0.0])
+
+
+@pytest.mark.parametrize("currents, expected", [
+    ([10, 10, 10], 0.0),
+    ([10, 0, 0], 10.0),
+    ([10, 10, 0], 10.0),
+    ([30, 20, 10], np.sqrt(300)),
+])
+def test_neutral_current_is_phasor_sum(currents, expected):
+    assert neutral_current(np.array(currents, dtype=float)[:, None]) == pytest.approx([expected])
+
+
+def test_metrics_per_plan_and_month():
+    loads = np.array([[220.0, 0.0], [220.0, 440.0], [440.0, 0.0], [np.nan, 220.0]])
+    plans = np.array([[0, 1, 2, -1], [0, 0, 1, 2]])
+    metrics = electrical_metrics(loads, plans, voltage=220, cosphi=1, hours=1000)
+
+    assert metrics["energy"].shape == (2, 3, 2)
+    assert metrics["currents"][0, :, 0] == pytest.approx([1, 1, 2])
+    assert metrics["currents"][1, :, 1] == pytest.approx([2, 0, 1])
+    assert metrics["max_deviation"] == pytest.approx(np.array([[1, 2], [2, 2]]))
+    assert metrics["neutral"][0, 0] == pytest.approx(1.0)
+    assert metrics["pui"][1, 1] == pytest.approx(200.0)
+
+
+def test_currents_are_zero_where_hours_are_zero():
+    assert phase_currents(np.ones((1, 3, 2)), hours=[0, 1000])[0, :, 0] == pytest.approx([0, 0, 0])
@@ -0,0 +1,92 @@
+import re
+
+import pytest
+
+import llm_client
+from balancing import energy_tolerance
+from bench import generate_station
+from engine import AI_Func
+
+
+class FirstCandidateBackend:
+    """Always picks the first load offered in the prompt."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, prompt, max_tokens=1000, model=llm_client.DEFAULT_MODEL):
+        self.calls += 1
+        return re.search(r"(Load_\d+)\|", prompt).group(1)
+
+
+class ConstantBackend:
+    """Always gives the same reply."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    def complete(self, prompt, max_tokens=1000, model=llm_client.DEFAULT_MODEL):
+        self.calls += 1
+        return self.reply
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = FirstCandidateBackend()
+    llm_client.set_backend(backend)
+    llm_client.set_cache(llm_client.ResponseCache(str(tmp_path / "llm.sqlite3")))
+    yield backend
+    llm_client.set_backend(None)
+    llm_client.set_cache(None)
+
+
+def moved(df_balanced):
+    return int((df_balanced["Pha hiện tại"] != df_balanced["Pha đề xuất"]).sum())
+
+
+def spread(df_balanced):
+    sums = df_balanced.groupby("Pha đề xuất")["Tháng 9"].sum()
+    return sums.max() - sums.min()
+
+
+def test_llm_solver_respects_max_load_change(backend):
+    df_balanced = AI_Func(generate_station(300), "llm", max_current=0.01, max_load_change=2)
+
+    assert moved(df_balanced) == 2
+
+
+def test_llm_solver_stops_at_max_current_tolerance(backend):
+    df = generate_station(300)
+    loose = AI_Func(df, "llm", max_current=50, max_load_change=15)
+    tight = AI_Func(df, "llm", max_current=0.5, max_load_change=15)
+
+    assert spread(loose) <= energy_tolerance(50)
+    assert moved(loose) < moved(tight)
+
+
+@pytest.mark.parametrize("reply", ["Không có", "Load_99999"])
+def test_llm_solver_stops_and_skips_cache_on_bad_replies(tmp_path, reply):
+    backend = ConstantBackend(reply)
+    cache = llm_client.ResponseCache(str(tmp_path / "llm.sqlite3"))
+    llm_client.set_backend(backend)
+    llm_client.set_cache(cache)
+    try:
+        df_balanced = AI_Func(generate_station(300), "llm", max_current=0.01, max_load_change=15)
+    finally:
+        llm_client.set_backend(None)
+        llm_client.set_cache(None)
+
+    assert moved(df_balanced) == 0
+    assert backend.calls == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_llm_solver_caches_accepted_replies(backend):
+    df = generate_station(300)
+    AI_Func(df, "llm", max_current=0.01, max_load_change=2)
+    calls = backend.calls
+    AI_Func(df, "llm", max_current=0.01, max_load_change=2)
+
+    assert calls == 2
+    assert backend.calls == calls
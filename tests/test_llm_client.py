@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+
+import llm_client
+from llm_client import LLMError, ResilientBackend, ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_client.time, "time", clock)
+    return clock
+
+
+def test_cache_round_trip(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "llm.sqlite3"))
+    assert cache.get("a") is None
+    cache.put("a", "Load_1")
+
+    assert cache.get("a") == "Load_1"
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_cache_evicts_least_recently_used(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "llm.sqlite3"), max_entries=2)
+    cache.put("a", "1")
+    clock.now += 1
+    cache.put("b", "2")
+    clock.now += 1
+    cache.get("a")
+    clock.now += 1
+    cache.put("c", "3")
+
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+
+def test_cache_expires_after_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "llm.sqlite3"), ttl=60)
+    cache.put("a", "1")
+    clock.now += 30
+    assert cache.get("a") == "1"
+    clock.now += 31
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+class FakeBackend:
+    """Fails with the queued errors first, then answers with the prompt."""
+
+    def __init__(self, errors=(), delay=0.0, gate=None):
+        self.errors = list(errors)
+        self.delay = delay
+        self.gate = gate
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def complete(self, prompt, max_tokens=1000, model="m"):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            error = self.errors.pop(0) if self.errors else None
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            time.sleep(self.delay)
+            if error is not None:
+                raise error
+            return f"reply:{prompt}"
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_retries_retryable_errors():
+    inner = FakeBackend([TimeoutError(), ConnectionError()])
+    backend = ResilientBackend(inner, retries=3, backoff=0)
+
+    assert backend.complete("p") == "reply:p"
+    assert inner.calls == 3
+    assert backend.histogram.snapshot()["calls"] == 3
+
+
+def test_gives_up_after_retries():
+    inner = FakeBackend([TimeoutError()] * 5)
+    backend = ResilientBackend(inner, retries=2, backoff=0)
+
+    with pytest.raises(LLMError):
+        backend.complete("p")
+    assert inner.calls == 3
+
+
+def test_does_not_retry_other_errors():
+    inner = FakeBackend([ValueError("bad request")])
+    backend = ResilientBackend(inner, retries=3, backoff=0)
+
+    with pytest.raises(LLMError):
+        backend.complete("p")
+    assert inner.calls == 1
+
+
+def run_threads(target, prompts):
+    results = [None] * len(prompts)
+
+    def call(index, prompt):
+        results[index] = target(prompt)
+
+    threads = [threading.Thread(target=call, args=item) for item in enumerate(prompts)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_coalesces_identical_prompts_in_flight():
+    gate = threading.Event()
+    inner = FakeBackend(gate=gate)
+    backend = ResilientBackend(inner, max_concurrency=4)
+
+    threads, results = run_threads(backend.complete, ["same"] * 6)
+    deadline = time.time() + 5
+    while inner.calls == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert inner.calls == 1
+    assert results == ["reply:same"] * 6
+
+
+def test_bounds_concurrent_calls():
+    inner = FakeBackend(delay=0.05)
+    backend = ResilientBackend(inner, max_concurrency=2)
+
+    threads, results = run_threads(backend.complete, [f"p{i}" for i in range(6)])
+    for thread in threads:
+        thread.join(5)
+
+    assert inner.calls == 6
+    assert inner.peak <= 2
+    assert results == [f"reply:p{i}" for i in range(6)]
@@ -0,0 +1,45 @@
+import io
+import threading
+
+from log_sink import ERROR, INFO, LogSink, StreamRedirect, format_record
+
+
+def test_records_since_returns_only_new_records():
+    sink = LogSink()
+    sink.log(INFO, "một")
+    seq = sink.last_seq()
+    sink.log(INFO, "hai")
+    sink.log(ERROR, "ba")
+
+    last, records = sink.records_since(seq)
+    assert last == sink.last_seq() == 3
+    assert [record[3] for record in records] == ["hai", "ba"]
+    assert sink.records_since(last) == (last, [])
+
+
+def test_records_since_filters_level_and_skips_dropped_records():
+    sink = LogSink(capacity=3)
+    for i in range(5):
+        sink.log(INFO if i % 2 else ERROR, str(i))
+
+    last, records = sink.records_since(0, min_level=ERROR)
+    assert last == 5
+    assert [record[3] for record in records] == ["2", "4"]
+    assert format_record(records[0]) == "[LỖI] 2"
+
+
+def test_stream_redirect_logs_whole_lines_per_thread_and_forwards():
+    sink = LogSink()
+    console = io.StringIO()
+    stream = StreamRedirect(sink, INFO, console)
+    stream.write("Lần lặp ")
+
+    worker = threading.Thread(target=lambda: stream.write("từ luồng khác\n"))
+    worker.start()
+    worker.join()
+    stream.write("1\nchưa xong")
+    stream.flush()
+
+    _, records = sink.records_since(0)
+    assert [record[3] for record in records] == ["từ luồng khác", "Lần lặp 1", "chưa xong"]
+    assert console.getvalue() == "Lần lặp từ luồng khác\n1\nchưa xong"
@@ -0,0 +1,79 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from balancing import encode_phases, peak_balance, peak_moves
+from bench import generate_profiles, generate_station
+from profiles import import_interval_csv, open_profiles
+
+
+def peak_after(columns, codes):
+    return max(columns[codes == code].sum(axis=0).max() for code in range(3))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_first_peak_move_is_the_best_single_move(seed):
+    rng = np.random.default_rng(seed)
+    columns = rng.random((8, 6)) * 10
+    codes = rng.integers(0, 3, size=8)
+
+    new_codes, moves = peak_moves(columns, codes, np.ones(8, dtype=bool), 0, 1)
+
+    best = min(peak_after(columns, np.where(np.arange(8) == row, target, codes))
+               for row, target in itertools.product(range(8), range(3)))
+    if moves:
+        assert peak_after(columns, new_codes) == pytest.approx(best)
+    else:
+        assert best >= peak_after(columns, codes) - 1e-9
+
+
+def test_peak_moves_respects_movable_and_max_moves():
+    rng = np.random.default_rng(0)
+    columns = rng.random((30, 24)) * 10
+    codes = np.zeros(30, dtype=np.int64)
+    movable = np.arange(30) % 2 == 0
+
+    new_codes, moves = peak_moves(columns, codes, movable, 0, 4)
+
+    assert len(moves) == 4
+    assert all(movable[row] for row, _, _ in moves)
+    assert len({row for row, _, _ in moves}) == len(moves)
+    assert (new_codes != codes).sum() == 4
+    assert peak_after(columns, new_codes) < peak_after(columns, codes)
+
+
+def test_peak_balance_lowers_the_peak(tmp_path):
+    df = generate_station(200)
+    df.attrs["path"] = str(tmp_path / "table1.xlsx")
+    generate_profiles(df, str(tmp_path / "table1.profiles"), intervals=72)
+    profiles = open_profiles(str(tmp_path / "table1.profiles"))
+
+    df_balanced = peak_balance(df, max_load_change=5)
+
+    rows = profiles.rows_for(df["Tên"])
+    before = profiles.phase_profile(rows, encode_phases(df_balanced["Pha hiện tại"])).max()
+    after = profiles.phase_profile(rows, encode_phases(df_balanced["Pha đề xuất"])).max()
+    assert 0 < (df_balanced["Pha hiện tại"] != df_balanced["Pha đề xuất"]).sum() <= 5
+    assert after < before
+
+
+def test_peak_balance_needs_profiles():
+    with pytest.raises(ValueError):
+        peak_balance(generate_station(10))
+
+
+def test_import_interval_csv_adds_repeated_readings(tmp_path):
+    csv_path = tmp_path / "readings.csv"
+    pd.DataFrame({
+        "Tên": ["Load_1", "Load_2", "Load_1", "Load_1"],
+        "Thời gian": ["2024-01-01 00:00", "2024-01-01 01:00", "2024-01-01 02:00", "2024-01-01 02:00"],
+        "kWh": [1.0, 2.0, 3.0, 4.0],
+    }).to_csv(csv_path, index=False)
+
+    profiles = import_interval_csv(str(csv_path), str(tmp_path / "profiles"))
+
+    assert profiles.names == ["Load_1", "Load_2"]
+    assert profiles.readings.tolist() == [[1.0, 0.0, 7.0], [0.0, 2.0, 0.0]]
+    assert profiles.rows_for(["Load_2", "Load_9"]).tolist() == [1, -1]
@@ -0,0 +1,35 @@
+import pytest
+
+from bench import generate_station
+from prompts import choice_prompt, count_tokens
+
+
+@pytest.mark.parametrize("budget", [400, 800, 1500])
+def test_choice_prompt_stays_under_budget(budget):
+    candidates = generate_station(3000)
+
+    prompt, tokens, used = choice_prompt(candidates, "A", "C", 5000, "Điều kiện thử", budget=budget)
+
+    assert tokens == count_tokens(prompt)
+    assert tokens <= budget
+    assert 0 < used < len(candidates)
+    assert "Load_1|" in prompt
+    assert f"Load_{used}|" in prompt and f"Load_{used + 1}|" not in prompt
+
+
+def test_choice_prompt_keeps_one_candidate_when_budget_is_tiny():
+    candidates = generate_station(10)
+
+    prompt, tokens, used = choice_prompt(candidates, "A", "C", 100, "", budget=1)
+
+    assert used == 1
+    assert "Load_1|" in prompt
+
+
+def test_choice_prompt_uses_all_candidates_when_they_fit():
+    candidates = generate_station(5)
+
+    _, tokens, used = choice_prompt(candidates, "B", "A", 100, "", budget=10_000)
+
+    assert used == 5
+    assert tokens < 10_000
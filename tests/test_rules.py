@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench import generate_station
+from engine import AI_Func
+from rules import Rules, load_conditions, load_rules, save_conditions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def station():
+    return pd.DataFrame({
+        "Tên": ["a", "b", "c", "d", "e", "f"],
+        "Tháng 6": [1000, 1000, 300, 2000, 100, 50],
+        "Tháng 7": [1000, 400, 300, 1900, 100, 50],
+        "Tháng 8": [1000, 400, 300, 1800, 700, 50],
+        "Tháng 9": [1000, 400, 30, 1100, 700, None],
+        "Pha": ["A", "B", "C", "A", "B", "C"],
+    })
+
+
+def conditions(avoid_top_loads=5, max_moves_per_load=2, tolerance=150, threshold=750):
+    return {"constraints": {
+        "limited_load_movements": {"avoid_top_loads": avoid_top_loads, "max_moves_per_load": max_moves_per_load},
+        "load_movement_threshold": tolerance,
+        "sudden_drop_avoidance": {"threshold": threshold},
+    }}
+
+
+def test_load_conditions_reads_shipped_constraints():
+    constraints = load_conditions(os.path.join(ROOT, "Condition.docx"))["constraints"]
+
+    assert constraints["limited_load_movements"] == {"avoid_top_loads": 3, "max_moves_per_load": 3}
+    assert constraints["load_movement_threshold"] == 200
+    assert constraints["sudden_drop_avoidance"] == {"threshold": 500}
+
+
+def test_load_rules_reads_saved_conditions(tmp_path):
+    path = str(tmp_path / "condition.docx")
+    save_conditions(path, conditions(threshold="750"))
+
+    rules = load_rules(path)
+
+    assert (rules.avoid_top_loads, rules.max_moves_per_load, rules.tolerance) == (5, 2, 150.0)
+    assert rules.sudden_drop_threshold == 750.0 and isinstance(rules.sudden_drop_threshold, float)
+    assert load_rules(path) is rules
+
+
+def test_load_rules_defaults_without_file(tmp_path):
+    rules = load_rules(str(tmp_path / "missing.docx"))
+
+    assert vars(rules) == vars(Rules())
+
+
+def test_from_conditions_without_drop_threshold():
+    rules = Rules.from_conditions(conditions(threshold=None))
+
+    assert rules.sudden_drop_threshold is None
+    assert not rules.sudden_drops(station()).any()
+
+
+def test_movable_pins_top_loads_and_drops():
+    movable = Rules(avoid_top_loads=2).movable(station())
+
+    # Top two of Tháng 9 are "d" and "a"; "b" and "d" dropped sharply.
+    assert movable.tolist() == [False, False, True, False, True, True]
+    assert movable.dtype == np.bool_
+
+
+@pytest.mark.parametrize("solver", ["greedy", "exact"])
+def test_solvers_honour_max_moves_per_load(tmp_path, monkeypatch, solver):
+    monkeypatch.chdir(tmp_path)
+    save_conditions("condition.docx", conditions(avoid_top_loads=0, max_moves_per_load=0))
+
+    df_balanced = AI_Func(generate_station(100), solver, max_current=0.5, max_load_change=5)
+
+    assert (df_balanced["Pha hiện tại"] == df_balanced["Pha đề xuất"]).all()
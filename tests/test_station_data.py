@@ -0,0 +1,21 @@
+import os
+
+from bench import generate_station
+from station_data import DatasetRegistry
+
+
+def test_registry_views_are_versioned_and_independent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generate_station(20).to_excel("table1.xlsx", index=False)
+    registry = DatasetRegistry()
+
+    view = registry.view("table1.xlsx")
+    view.loc[0, "Pha"] = "X"
+    assert registry.view("table1.xlsx").loc[0, "Pha"] != "X"
+    assert view.attrs["version"] == 1
+
+    generate_station(21, seed=1).to_excel("table1.xlsx", index=False)
+    os.utime("table1.xlsx", ns=(1, 10**18))
+    reloaded = registry.view("table1.xlsx")
+    assert reloaded.attrs["version"] == 2
+    assert len(reloaded) == 21
@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+
+from station_store import PlanConflict, StationStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StationStore(str(tmp_path / "stations.sqlite3"))
+    store.import_frame("tram", station(), source="tram.xlsx")
+    return store
+
+
+def station():
+    return pd.DataFrame({
+        "Tên": ["a", "b", "c", "d"],
+        "Mã KH": ["PD1", None, "PD3", "PD4"],
+        "Ngày": pd.to_datetime(["2024-05-01", None, "2024-05-03", "2024-05-04"]),
+        "Tháng 8": [100.0, 200.0, None, 400.0],
+        "Tháng 9": [110, 210, 310, 410],
+        "Pha": ["A", "B", "C", "A"],
+    })
+
+
+def phases(store):
+    return store.frame("tram")["Pha"].tolist()
+
+
+def test_frame_round_trip(store):
+    df = store.frame("tram")
+
+    assert list(df.columns) == list(station().columns)
+    assert df["Tháng 9"].tolist() == [110, 210, 310, 410]
+    assert pd.isna(df.loc[2, "Tháng 8"]) and pd.isna(df.loc[1, "Mã KH"]) and pd.isna(df.loc[1, "Ngày"])
+    assert df.loc[0, "Ngày"] == "2024-05-01T00:00:00"
+
+
+def test_checkpoint_and_revert(store):
+    store.checkpoint("tram")
+    store.set_phases("tram", [(0, "A", "C")])
+    assert phases(store) == ["C", "B", "C", "A"]
+
+    store.revert("tram")
+
+    assert phases(store) == ["A", "B", "C", "A"]
+
+
+def test_apply_and_undo_plan(store):
+    plan = store.save_plan("tram", [(0, "A", "B"), (2, "C", "A")], "greedy", {"PUI_old": 3.0, "PUI_new": 1.0})
+
+    assert store.apply_plan(plan) == [(0, "A", "B"), (2, "C", "A")]
+    assert phases(store) == ["B", "B", "A", "A"]
+    assert store.apply_plan(plan) == []
+    assert store.last_applied("tram") == plan
+
+    assert store.undo_plan(plan) == [(0, "B", "A"), (2, "A", "C")]
+    assert phases(store) == ["A", "B", "C", "A"]
+    assert store.last_applied("tram") is None
+
+    [listed] = store.plans("tram")
+    assert listed["moves"] == 2 and listed["metrics"] == {"PUI_old": 3.0, "PUI_new": 1.0}
+    assert not listed["stale"] and listed["applied"] is None
+
+
+def test_apply_rejects_conflicting_plan(store):
+    first = store.save_plan("tram", [(0, "A", "B")])
+    second = store.save_plan("tram", [(0, "A", "C"), (1, "B", "C")])
+    store.apply_plan(first)
+
+    with pytest.raises(PlanConflict):
+        store.apply_plan(second)
+
+    assert phases(store) == ["B", "B", "C", "A"]
+
+
+def test_plans_of_reimported_data_are_stale(store):
+    plan = store.save_plan("tram", [(0, "A", "B")])
+    store.import_frame("tram", station())
+
+    assert store.plans("tram")[0]["stale"]
+    with pytest.raises(PlanConflict):
+        store.apply_plan(plan)
+    fresh = store.save_plan("tram", [(0, "A", "B")])
+    assert store.apply_plan(fresh) == [(0, "A", "B")]
+
+
+def test_compare_plans(store):
+    first = store.save_plan("tram", [(0, "A", "B"), (2, "C", "A")])
+    second = store.save_plan("tram", [(0, "A", "B"), (3, "A", "C")])
+
+    assert store.compare_plans(first, second) == [(2, "A", "C"), (3, "A", "C")]
+
+
+def test_frame_views_are_versioned_and_independent(store):
+    df = store.frame("tram")
+    df.loc[0, "Pha"] = "C"
+    version = df.attrs["version"]
+
+    assert phases(store) == ["A", "B", "C", "A"]
+    store.set_phases("tram", [(0, "A", "B")])
+    assert store.frame("tram").attrs["version"] == version + 1